@@ -264,7 +264,7 @@ control MyIngress(inout headers hdr,
                 operation_update_log();
             }
             else {
-                bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;
+                {{bucket_hash}}
                 r_keys.read(keys_bit, h);
                 keys_mask = ({{keys_mask}}) ^ keys_bit;
 
@@ -373,6 +373,31 @@ if (index == {{i}}) {
 }
 ''')
 
+# Bucket index h for each pkache.hashing bucket hash of the same name. bmv2's hash() returns
+# base + crc % max, the others compute the same value pkache.hashing does for the bit<32> cast key.
+BUCKET_HASH_TEMPLATES = {
+    'mod': '''bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;''',
+    'mul': '''
+bit<32> h = (bit<32>)hdr.p4kway.k * 32w0x9E3779B1;
+h = (bit<32>)(((bit<64>)h * MAX_ENTRIES) >> 32);
+''',
+    'crc16': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc16, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'crc32': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc32, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'xor': '''
+bit<32> h = (bit<32>)hdr.p4kway.k;
+h = h ^ (h >> 16);
+h = h ^ (h >> 8);
+h = h % MAX_ENTRIES;
+''',
+}
+
+
 def get_first_mask(size, index, key_size):
     l = key_size // 4
     mask = ['F' * l] * size
@@ -402,6 +427,8 @@ if __name__ == "__main__":
     max_entries_size = 16
     cache_size = 16
     key_size = 16
+    # One of BUCKET_HASH_TEMPLATES
+    bucket_hash = 'mod'
     counter_size = 16
     period_size = 16
     access_size = 16
@@ -428,6 +455,7 @@ if __name__ == "__main__":
     p4_generated_file = (P4_TEMPLATE.render
                         (
                             max_entries_size=max_entries_size,
+                            bucket_hash=BUCKET_HASH_TEMPLATES[bucket_hash],
                             key_size=key_size,          
                             counter_size=counter_size,
                             cache_size=cache_size,
@@ -0,0 +1,28 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pkache.simulator import Hyperbolic, add_replay_arguments, replay
+from pkache.traces import read_keys
+
+
+MAX_ENTRIES = 16
+CACHE_SIZE = 16
+# Candidates compared per eviction, None scans the whole bucket
+SAMPLES = None
+# Compare log2 priorities through r_log like the data plane instead of exact ratios
+LOG_TABLE = False
+
+SIMULATOR = Hyperbolic(MAX_ENTRIES, CACHE_SIZE, SAMPLES, LOG_TABLE)
+process_key = SIMULATOR.process_key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    # OLTP.lis and WebSearch*.spc traces are parsed by extension, anything else is one key per line
+    parser.add_argument('trace', nargs='?', default='/home/dor/dev/Thesis/src/traces/OLTP.lis')
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+    replay(SIMULATOR, read_keys(args.trace), args.every, args.seconds, args.quiet, args.summary,
+           args.buckets, args.series, args.window)
@@ -1,3 +1,5 @@
+import re
+
 from jinja2 import Template
 
 P4_TEMPLATE = Template('''
@@ -326,7 +328,7 @@ control MyIngress(inout headers hdr,
             r_counter.write((bit<32>)hdr.p4kway.k, counter_value);
             
 
-            bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;
+            {{bucket_hash}}{{two_choice}}
             r_front_keys.read(front_keys_bit, h);
             r_main_keys.read(main_keys_bit, h);
             front_keys_mask = ({{front_keys_mask}}) ^ front_keys_bit;
@@ -469,6 +471,75 @@ if (index == {{i}}) {
 ''')
 
 
+# Bucket index h for each pkache.hashing bucket hash of the same name. bmv2's hash() returns
+# base + crc % max, the others compute the same value pkache.hashing does for the bit<32> cast key.
+BUCKET_HASH_TEMPLATES = {
+    'mod': '''bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;''',
+    'mul': '''
+bit<32> h = (bit<32>)hdr.p4kway.k * 32w0x9E3779B1;
+h = (bit<32>)(((bit<64>)h * MAX_ENTRIES) >> 32);
+''',
+    'crc16': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc16, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'crc32': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc32, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'xor': '''
+bit<32> h = (bit<32>)hdr.p4kway.k;
+h = h ^ (h >> 16);
+h = h ^ (h >> 8);
+h = h % MAX_ENTRIES;
+''',
+}
+
+
+def second_bucket_hash(name):
+    # BUCKET_HASH_TEMPLATES entry computing h2 instead of h
+    return re.sub(r'\bh\b', 'h2', BUCKET_HASH_TEMPLATES[name])
+
+
+# pkache's TwoTier.choose_bucket() models this rule, the last front slot being the FIFO front's next victim
+TWO_CHOICE_TEMPLATE = Template('''
+// Two-choice placement: the key may live in bucket h or h2. A lookup uses the bucket holding it, a miss goes to
+// the one with fewer occupied slots across both caches and on a tie to the one whose last front slot is older.
+{{second_hash}}
+bit<(KEY_SIZE * FRONT_CACHE_SIZE)> first_front_keys;
+bit<(KEY_SIZE * FRONT_CACHE_SIZE)> second_front_keys;
+bit<(KEY_SIZE * MAIN_CACHE_SIZE)> first_main_keys;
+bit<(KEY_SIZE * MAIN_CACHE_SIZE)> second_main_keys;
+r_front_keys.read(first_front_keys, h);
+r_front_keys.read(second_front_keys, h2);
+r_main_keys.read(first_main_keys, h);
+r_main_keys.read(second_main_keys, h2);
+bool in_first = false;
+bool in_second = false;
+bit<8> first_load = 0;
+bit<8> second_load = 0;
+{% for type, size in (('front', front_cache_size), ('main', main_cache_size)) %}{% for i in range(size) %}
+if (first_{{type}}_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] == hdr.p4kway.k) { in_first = true; }
+if (second_{{type}}_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] == hdr.p4kway.k) { in_second = true; }
+if (first_{{type}}_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] != 0) { first_load = first_load + 1; }
+if (second_{{type}}_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] != 0) { second_load = second_load + 1; }
+{% endfor %}{% endfor %}
+if (!in_first) {
+    if (in_second || second_load < first_load) {
+        h = h2;
+    } else if (second_load == first_load) {
+        bit<(ELEMENT_SIZE * FRONT_CACHE_SIZE)> first_front_element;
+        bit<(ELEMENT_SIZE * FRONT_CACHE_SIZE)> second_front_element;
+        r_front_cache.read(first_front_element, h);
+        r_front_cache.read(second_front_element, h2);
+        if (second_front_element[{{(2*counter_size+key_size)*(front_cache_size-1) + 2*counter_size - 1}}:{{(2*counter_size+key_size)*(front_cache_size-1) + counter_size}}] < first_front_element[{{(2*counter_size+key_size)*(front_cache_size-1) + 2*counter_size - 1}}:{{(2*counter_size+key_size)*(front_cache_size-1) + counter_size}}]) {
+            h = h2;
+        }
+    }
+}
+''')
+
+
 DEAMORTIZATION_PROCESS_TEMPLATE = Template('''
 if (current_timestamp == {{8 * (i+1)}}) {
     {{deamortization_inner}}
@@ -477,7 +548,7 @@ if (current_timestamp == {{8 * (i+1)}}) {
 
 DEAMORTIZATION_INNER_TEMPLATE = Template('''
 r_counter.read(counter_value, {{i}});
-counter_value = counter_value << 1;
+counter_value = counter_value >> 1;
 r_counter.write({{i}}, counter_value);
 ''')
 
@@ -511,6 +582,10 @@ if __name__ == "__main__":
     main_cache_size = 2
     front_cache_size = 1
     key_size = 16
+    # One of BUCKET_HASH_TEMPLATES
+    bucket_hash = 'mod'
+    # None, or a second BUCKET_HASH_TEMPLATES entry to place each key in the emptier of two buckets
+    second_hash = None
     counter_size = 32
     
     main_actions = '\n'.join(list(map(lambda x: MAIN_ACTION_TEMPLATE.render(i=x, type="main", key_size=key_size, counter_size=counter_size), range(1,main_cache_size))))
@@ -553,9 +628,17 @@ if __name__ == "__main__":
 
     
 
+    two_choice = ''
+    if second_hash:
+        two_choice = TWO_CHOICE_TEMPLATE.render(second_hash=second_bucket_hash(second_hash), key_size=key_size,
+                                                counter_size=counter_size, front_cache_size=front_cache_size,
+                                                main_cache_size=main_cache_size)
+
     p4_generated_file = (P4_TEMPLATE.render
                         (
                             max_entries_size=max_entries_size,
+                            bucket_hash=BUCKET_HASH_TEMPLATES[bucket_hash],
+                            two_choice=two_choice,
                             key_size=key_size,          
                             main_cache_size=main_cache_size,
                             max_turns=8*main_cache_size*max_entries_size,
@@ -1,3 +1,5 @@
+import re
+
 from jinja2 import Template
 
 P4_TEMPLATE = Template('''
@@ -242,7 +244,7 @@ control MyIngress(inout headers hdr,
             r_counter.write((bit<32>)hdr.p4kway.k, counter_value);
             
 
-            bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;
+            {{bucket_hash}}{{two_choice}}
             r_front_keys.read(front_keys_bit, h);
             front_keys_mask = ({{front_keys_mask}}) ^ front_keys_bit;
 
@@ -346,6 +348,71 @@ if (index == {{i}}) {
 ''')
 
 
+# Bucket index h for each pkache.hashing bucket hash of the same name. bmv2's hash() returns
+# base + crc % max, the others compute the same value pkache.hashing does for the bit<32> cast key.
+BUCKET_HASH_TEMPLATES = {
+    'mod': '''bit<32> h = (bit<32>)hdr.p4kway.k % MAX_ENTRIES;''',
+    'mul': '''
+bit<32> h = (bit<32>)hdr.p4kway.k * 32w0x9E3779B1;
+h = (bit<32>)(((bit<64>)h * MAX_ENTRIES) >> 32);
+''',
+    'crc16': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc16, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'crc32': '''
+bit<32> h;
+hash(h, HashAlgorithm.crc32, (bit<32>)0, { hdr.p4kway.k }, (bit<32>)MAX_ENTRIES);
+''',
+    'xor': '''
+bit<32> h = (bit<32>)hdr.p4kway.k;
+h = h ^ (h >> 16);
+h = h ^ (h >> 8);
+h = h % MAX_ENTRIES;
+''',
+}
+
+
+def second_bucket_hash(name):
+    # BUCKET_HASH_TEMPLATES entry computing h2 instead of h
+    return re.sub(r'\bh\b', 'h2', BUCKET_HASH_TEMPLATES[name])
+
+
+# pkache's Cache.choose_bucket() models this rule, the last slot being the next victim
+TWO_CHOICE_TEMPLATE = Template('''
+// Two-choice placement: the key may live in bucket h or h2. A lookup uses the bucket holding it, a miss goes to
+// the one with fewer occupied slots and on a tie to the one whose last front slot is older.
+{{second_hash}}
+bit<(KEY_SIZE * FRONT_CACHE_SIZE)> first_front_keys;
+bit<(KEY_SIZE * FRONT_CACHE_SIZE)> second_front_keys;
+r_front_keys.read(first_front_keys, h);
+r_front_keys.read(second_front_keys, h2);
+bool in_first = false;
+bool in_second = false;
+bit<8> first_load = 0;
+bit<8> second_load = 0;
+{% for i in range(front_cache_size) %}
+if (first_front_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] == hdr.p4kway.k) { in_first = true; }
+if (second_front_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] == hdr.p4kway.k) { in_second = true; }
+if (first_front_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] != 0) { first_load = first_load + 1; }
+if (second_front_keys[{{key_size*(i+1)-1}}:{{key_size*i}}] != 0) { second_load = second_load + 1; }
+{% endfor %}
+if (!in_first) {
+    if (in_second || second_load < first_load) {
+        h = h2;
+    } else if (second_load == first_load) {
+        bit<(ELEMENT_SIZE * FRONT_CACHE_SIZE)> first_front_element;
+        bit<(ELEMENT_SIZE * FRONT_CACHE_SIZE)> second_front_element;
+        r_front_cache.read(first_front_element, h);
+        r_front_cache.read(second_front_element, h2);
+        if (second_front_element[{{(2*counter_size+key_size)*(front_cache_size-1) + 2*counter_size - 1}}:{{(2*counter_size+key_size)*(front_cache_size-1) + counter_size}}] < first_front_element[{{(2*counter_size+key_size)*(front_cache_size-1) + 2*counter_size - 1}}:{{(2*counter_size+key_size)*(front_cache_size-1) + counter_size}}]) {
+            h = h2;
+        }
+    }
+}
+''')
+
+
 DEAMORTIZATION_PROCESS_TEMPLATE = Template('''
 if (current_timestamp == {{8 * (i+1)}}) {
     {{deamortization_inner}}
@@ -354,7 +421,7 @@ if (current_timestamp == {{8 * (i+1)}}) {
 
 DEAMORTIZATION_INNER_TEMPLATE = Template('''
 r_counter.read(counter_value, {{i}});
-counter_value = counter_value << 1;
+counter_value = counter_value >> 1;
 r_counter.write({{i}}, counter_value);
 ''')
 
@@ -388,6 +455,10 @@ if __name__ == "__main__":
     main_cache_size = 2
     front_cache_size = 32
     key_size = 16
+    # One of BUCKET_HASH_TEMPLATES
+    bucket_hash = 'mod'
+    # None, or a second BUCKET_HASH_TEMPLATES entry to place each key in the emptier of two buckets
+    second_hash = None
     counter_size = 32
     
     main_actions = '\n'.join(list(map(lambda x: MAIN_ACTION_TEMPLATE.render(i=x, type="main", key_size=key_size, counter_size=counter_size), range(1,main_cache_size))))
@@ -430,9 +501,17 @@ if __name__ == "__main__":
 
     
 
+    two_choice = ''
+    if second_hash:
+        two_choice = TWO_CHOICE_TEMPLATE.render(second_hash=second_bucket_hash(second_hash), key_size=key_size,
+                                                counter_size=counter_size, front_cache_size=front_cache_size,
+                                                main_cache_size=main_cache_size)
+
     p4_generated_file = (P4_TEMPLATE.render
                         (
                             max_entries_size=max_entries_size,
+                            bucket_hash=BUCKET_HASH_TEMPLATES[bucket_hash],
+                            two_choice=two_choice,
                             key_size=key_size,          
                             main_cache_size=main_cache_size,
                             max_turns=8*main_cache_size*max_entries_size,
@@ -0,0 +1,52 @@
+import argparse
+
+import numpy
+
+from pkache.hashing import BUCKET_HASHES, bucket_array
+from pkache.policies import POLICIES
+from pkache.simulator import HYPERBOLIC, SINGLE, TWO_TIER, make_simulator
+from pkache.traces import read_keys
+
+
+def balance(buckets, d):
+    # Load balance of a bucket assignment: (max / mean, coefficient of variation, empty buckets)
+    counts = numpy.bincount(buckets, minlength=d)
+    mean = counts.mean()
+    return float(counts.max() / mean), float(counts.std() / mean), int((counts == 0).sum())
+
+
+def compare_hashes(keys, d, specs, factory):
+    # One report row per hash spec: request and distinct key balance across buckets and the hit ratio of
+    # factory(spec).run(keys)
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    distinct = numpy.unique(keys)
+    rows = []
+    for spec in specs:
+        max_load, cv, empty = balance(bucket_array(spec, keys, d), d)
+        max_keys, keys_cv, empty = balance(bucket_array(spec, distinct, d), d)
+        hit_front, hit_main, hit_miss = factory(spec).run(keys.tolist())
+        rows.append(dict(bucket_hash=spec, max_load=max_load, load_cv=cv, max_keys=max_keys, keys_cv=keys_cv,
+                         empty_buckets=empty, hit_ratio=(hit_front + hit_main) / max(len(keys), 1)))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare bucket hashes by per bucket load balance and hit ratio')
+    parser.add_argument('trace')
+    parser.add_argument('--hash', nargs='+', default=list(BUCKET_HASHES),
+                        help='Bucket hashes as <name>[:<key bits>], names are %s' % ', '.join(BUCKET_HASHES))
+    parser.add_argument('--model', choices=(SINGLE, TWO_TIER, HYPERBOLIC), default=TWO_TIER)
+    parser.add_argument('-d', type=int, default=16, help='Number of buckets')
+    parser.add_argument('--front-size', type=int, default=4)
+    parser.add_argument('--main-size', type=int, default=16)
+    parser.add_argument('--front-policy', choices=sorted(POLICIES), default=None)
+    parser.add_argument('--main-policy', choices=sorted(POLICIES), default=None)
+    args = parser.parse_args()
+
+    rows = compare_hashes(list(read_keys(args.trace)), args.d, args.hash, lambda spec: make_simulator(
+        args.model, args.d, args.front_size, args.main_size, args.front_policy, args.main_policy,
+        bucket_hash=spec))
+    print('bucket_hash,max_load,load_cv,max_keys,keys_cv,empty_buckets,hit_ratio')
+    for row in rows:
+        print('%(bucket_hash)s,%(max_load).3f,%(load_cv).3f,%(max_keys).3f,%(keys_cv).3f,%(empty_buckets)d,'
+              '%(hit_ratio).4f' % row)
@@ -0,0 +1,187 @@
+import numpy
+
+from pkache.hashing import bucket_array
+from pkache.policies import FIFO, HYPER, LFU, LFU_LRU, LRU, POLICIES, ACCESS_COUNTS, LFU_COUNTERS, LRU_COUNTERS
+
+MISS = 0
+HIT_FRONT = 1
+HIT_MAIN = 2
+
+
+def last_argmin(values):
+    # Position of the minimum in each row, ties go to the highest position like the Cache scans
+    return values.shape[1] - 1 - numpy.argmin(values[:, ::-1], axis=1)
+
+
+class BatchCache:
+    # Cache with every bucket held as a row of d x size NumPy columns, operations take one request per bucket
+    def __init__(self, size, d, policy, track=None):
+        self.d = d
+        self.size = size
+        self.policy = policy
+        # Keys are stored as dense ids, see BatchSimulator.run()
+        self.keys = numpy.zeros((d, size), dtype=numpy.int64)
+        self.lfu_counters = numpy.zeros((d, size), dtype=numpy.int64)
+        self.lru_counters = numpy.zeros((d, size), dtype=numpy.int64)
+        self.insertion_times = numpy.zeros((d, size), dtype=numpy.int64)
+        self.n = numpy.zeros((d, size), dtype=numpy.int64)
+        self.fill = numpy.zeros(d, dtype=numpy.int64)
+        self.heads = numpy.zeros(d, dtype=numpy.int64)
+        self.slots = numpy.arange(size)
+        counters = set(POLICIES[policy].counters)
+        for name in track or '':
+            counters.update(POLICIES[name].counters)
+        self.track_lfu = LFU_COUNTERS in counters
+        self.track_lru = LRU_COUNTERS in counters
+        self.track_n = ACCESS_COUNTS in counters
+
+    def lookup(self, rows, keys):
+        match = (self.keys[rows] == keys[:, None]) & (self.slots < self.fill[rows][:, None])
+        return match.any(axis=1), match.argmax(axis=1)
+
+    def touch(self, rows, slots, timestamps):
+        if self.track_lfu:
+            self.lfu_counters[rows, slots] += 1
+        if self.track_lru:
+            self.lru_counters[rows, slots] = timestamps
+        if self.track_n:
+            self.n[rows, slots] += 1
+
+    def choose_victim(self, rows, timestamps):
+        if self.policy == LFU:
+            return last_argmin(self.lfu_counters[rows])
+        elif self.policy == LRU:
+            return last_argmin(self.lru_counters[rows])
+        elif self.policy == HYPER:
+            return last_argmin(self.n[rows] / (timestamps[:, None] - self.insertion_times[rows]))
+        elif self.policy == LFU_LRU:
+            lfu = self.lfu_counters[rows]
+            lru = self.lru_counters[rows]
+            min = numpy.full(len(rows), 2 ** 32 - 1, dtype=numpy.int64)
+            min_lru = numpy.full(len(rows), 2 ** 32 - 1, dtype=numpy.int64)
+            pos = numpy.zeros(len(rows), dtype=numpy.int64)
+            for i in range(self.size):
+                better = (lfu[:, i] <= min) & (lru[:, i] <= min_lru)
+                pos[better] = i
+                min[better] = lfu[better, i]
+                min_lru[better] = lru[better, i]
+            return pos
+        else:
+            return self.heads[rows]
+
+    def element(self, rows, slots):
+        return (self.keys[rows, slots], self.lfu_counters[rows, slots], self.lru_counters[rows, slots],
+                self.insertion_times[rows, slots], self.n[rows, slots])
+
+    def insert(self, rows, keys, lfu_counters, lru_counters, insertion_times, n, timestamps):
+        # Returns the mask of rows that evicted and the evicted elements' columns
+        slots = self.fill[rows].copy()
+        full = slots == self.size
+        slots[full] = self.choose_victim(rows[full], timestamps[full])
+        victims = self.element(rows[full], slots[full])
+        if self.policy == FIFO:
+            self.heads[rows[full]] = (self.heads[rows[full]] + 1) % self.size
+        self.fill[rows[~full]] += 1
+        self.keys[rows, slots] = keys
+        self.lfu_counters[rows, slots] = lfu_counters
+        self.lru_counters[rows, slots] = lru_counters
+        self.insertion_times[rows, slots] = insertion_times
+        self.n[rows, slots] = n
+        return full, victims
+
+
+def lockstep(buckets, d):
+    # Requests to different buckets never interact, so the trace is partitioned by bucket and step r yields
+    # the buckets that have an r-th request together with those requests' positions in the trace
+    order = numpy.argsort(buckets, kind='stable')
+    counts = numpy.bincount(buckets, minlength=d)
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    by_count = numpy.argsort(-counts, kind='stable')
+    sorted_counts = counts[by_count]
+    for r in range(counts.max() if len(buckets) else 0):
+        rows = by_count[:numpy.searchsorted(-sorted_counts, -r, side='left')]
+        yield rows, order[starts[rows] + r]
+
+
+class BatchSimulator:
+    d = None
+    bucket_hash = None
+
+    def run(self, keys):
+        # Processes the r-th request of every bucket at once, timestamps stay the global trace positions
+        keys = numpy.asarray(keys, dtype=numpy.int64)
+        ids = numpy.unique(keys, return_inverse=True)[1].reshape(-1)
+        self.frequencies = numpy.zeros(ids.max() + 1 if len(ids) else 0, dtype=numpy.int64)
+        self.outcomes = numpy.zeros(len(keys), dtype=numpy.int8)
+        for rows, timestamps in lockstep(bucket_array(self.bucket_hash, keys, self.d), self.d):
+            self.step(rows, ids[timestamps], timestamps)
+        return (int((self.outcomes == HIT_FRONT).sum()), int((self.outcomes == HIT_MAIN).sum()),
+                int((self.outcomes == MISS).sum()))
+
+    def step(self, rows, ids, timestamps):
+        raise NotImplementedError
+
+
+class BatchSingleTier(BatchSimulator):
+    def __init__(self, d, front_size, front_policy=LRU, bucket_hash=None):
+        self.d = d
+        self.bucket_hash = bucket_hash
+        self.front = BatchCache(front_size, d, front_policy)
+
+    def step(self, rows, ids, timestamps):
+        self.frequencies[ids] += 1
+        hit, slots = self.front.lookup(rows, ids)
+        self.front.touch(rows[hit], slots[hit], timestamps[hit])
+        self.outcomes[timestamps[hit]] = HIT_FRONT
+        miss = ~hit
+        t = timestamps[miss]
+        self.front.insert(rows[miss], ids[miss], 1, t, t, 1, t)
+
+
+class BatchHyperbolic(BatchSingleTier):
+    def __init__(self, d, size, bucket_hash=None):
+        super().__init__(d, size, HYPER, bucket_hash)
+
+
+class BatchTwoTier(BatchSimulator):
+    def __init__(self, k, front_size, main_size, front_policy=FIFO, main_policy=LFU, bucket_hash=None):
+        self.d = k
+        self.bucket_hash = bucket_hash
+        self.main = BatchCache(main_size, k, main_policy, track=LFU + LRU)
+        self.front = BatchCache(front_size, k, front_policy, track=LFU + LRU)
+
+    def step(self, rows, ids, timestamps):
+        front, main = self.front, self.main
+        self.frequencies[ids] += 1
+
+        hit, slots = front.lookup(rows, ids)
+        front.touch(rows[hit], slots[hit], timestamps[hit])
+        self.outcomes[timestamps[hit]] = HIT_FRONT
+        rows, ids, timestamps = rows[~hit], ids[~hit], timestamps[~hit]
+
+        hit, slots = main.lookup(rows, ids)
+        main.touch(rows[hit], slots[hit], timestamps[hit])
+        self.outcomes[timestamps[hit]] = HIT_MAIN
+        rows, ids, timestamps = rows[~hit], ids[~hit], timestamps[~hit]
+
+        evicted, victims = front.insert(rows, ids, 1, timestamps, timestamps, 1, timestamps)
+        rows, timestamps = rows[evicted], timestamps[evicted]
+
+        free = main.fill[rows] < main.size
+        main.insert(rows[free], *[column[free] for column in victims], timestamps[free])
+        rows, timestamps = rows[~free], timestamps[~free]
+        victims = [column[~free] for column in victims]
+
+        # Admission filter, mirrors TwoTier.process_key including get_element()'s position 0 fallback
+        if main.policy == LFU or main.policy == LRU:
+            slots = last_argmin(main.lfu_counters[rows])
+            slots[slots == 0] = main.size - 1
+            if main.policy == LFU:
+                insert = main.lfu_counters[rows, slots] < victims[1]
+            else:
+                insert = main.lru_counters[rows, slots] < victims[2]
+        else:
+            slots = main.heads[rows] if main.policy == FIFO else numpy.full(len(rows), main.size - 1)
+            insert = numpy.ones(len(rows), dtype=bool)
+        admit = insert & (self.frequencies[main.keys[rows, slots]] <= self.frequencies[victims[0]])
+        main.insert(rows[admit], *[column[admit] for column in victims], timestamps[admit])
@@ -0,0 +1,130 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+
+from pkache.frequency import EXACT
+from pkache.hashing import add_bucket_hash_argument, add_second_hash_argument
+from pkache.policies import POLICIES
+from pkache.simulator import HYPERBOLIC, SINGLE, TWO_TIER, make_simulator
+from pkache.sweep import FIELDS, grid, write_results
+from pkache.traces import read_keys
+
+BENCHMARK_FIELDS = FIELDS + ('requests_per_second', 'bytes_per_element', 'admission_bytes')
+# Where the cache structures (Cache columns, index and policy heaps) and the admission counters are allocated
+CACHE_FILES = [tracemalloc.Filter(True, '*/pkache/cache.py'), tracemalloc.Filter(True, '*/pkache/policies.py')]
+ADMISSION_FILES = [tracemalloc.Filter(True, '*/pkache/frequency.py')]
+TRACES = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'traces', 'query*.txt'))
+
+
+def build(config):
+    return make_simulator(config['model'], config['d'], config['front_size'], config['main_size'],
+                          config['front_policy'], config['main_policy'], config['frequencies'],
+                          config['bucket_hash'], config['second_hash'])
+
+
+def capacity(config):
+    return config['d'] * (config['front_size'] + (config['main_size'] or 0))
+
+
+def bench_cell(config, keys, repeat=3):
+    # Best of repeat runs like timeit: seconds covers construction and replay, requests_per_second the
+    # process_key() loop alone. Memory is traced in a separate run since tracemalloc slows allocation down,
+    # what the cache structures hold afterwards is split over the cache capacity and the admission counters
+    # are reported apart since they grow with the distinct keys rather than the cache.
+    seconds = run_seconds = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        simulator = build(config)
+        built = time.perf_counter()
+        hit_front, hit_main, hit_miss = simulator.run(keys)
+        end = time.perf_counter()
+        seconds = min(seconds, end - start)
+        run_seconds = min(run_seconds, end - built)
+    del simulator
+    tracemalloc.start()
+    try:
+        simulator = build(config)
+        simulator.run(keys)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    cache_bytes = sum(stat.size for stat in snapshot.filter_traces(CACHE_FILES).statistics('filename'))
+    admission_bytes = sum(stat.size for stat in snapshot.filter_traces(ADMISSION_FILES).statistics('filename'))
+    return dict(config, hit_front=hit_front, hit_main=hit_main, hit_miss=hit_miss,
+                hit_ratio=(hit_front + hit_main) / max(hit_front + hit_main + hit_miss, 1), seconds=seconds,
+                requests_per_second=len(keys) / run_seconds, bytes_per_element=cache_bytes / capacity(config),
+                admission_bytes=admission_bytes)
+
+
+def benchmark(configs, repeat=3):
+    # Cells run one after another in this process so they do not compete for the CPU being timed
+    traces = dict()
+    results = []
+    for config in configs:
+        if config['trace'] not in traces:
+            traces[config['trace']] = array('Q', read_keys(config['trace']))
+        results.append(bench_cell(config, traces[config['trace']], repeat))
+    return results
+
+
+def cell_name(result):
+    return ' '.join('%s=%s' % (field, result.get(field)) for field in FIELDS[:FIELDS.index('hit_front')])
+
+
+def regressions(results, baseline, tolerance=0.1):
+    # Cells whose hit ratio changed at all or whose throughput dropped by more than tolerance, the replay
+    # is deterministic so any hit ratio difference is an accuracy change rather than noise
+    previous = dict((cell_name(result), result) for result in baseline)
+    found = []
+    for result in results:
+        before = previous.get(cell_name(result))
+        if before is None:
+            continue
+        if result['hit_ratio'] != before['hit_ratio']:
+            found.append('%s: hit ratio %s -> %s' % (cell_name(result), before['hit_ratio'], result['hit_ratio']))
+        if result['requests_per_second'] < before['requests_per_second'] * (1 - tolerance):
+            found.append('%s: %.0f -> %.0f requests/s' % (cell_name(result), before['requests_per_second'],
+                                                          result['requests_per_second']))
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time every model and policy combination on each workload and '
+                                                 'record hit ratios alongside')
+    parser.add_argument('traces', nargs='*', help='Defaults to src/traces/query*.txt')
+    parser.add_argument('--model', nargs='+', choices=(SINGLE, TWO_TIER, HYPERBOLIC),
+                        default=[SINGLE, TWO_TIER, HYPERBOLIC])
+    parser.add_argument('-d', nargs='+', type=int, default=[16], help='Number of buckets')
+    parser.add_argument('--front-size', nargs='+', type=int, default=[4])
+    parser.add_argument('--main-size', nargs='+', type=int, default=[16])
+    parser.add_argument('--front-policy', nargs='+', choices=sorted(POLICIES), default=sorted(POLICIES))
+    parser.add_argument('--main-policy', nargs='+', choices=sorted(POLICIES), default=sorted(POLICIES))
+    parser.add_argument('--frequencies', nargs='+', default=[EXACT])
+    add_bucket_hash_argument(parser, multiple=True)
+    add_second_hash_argument(parser, multiple=True)
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Timed runs per cell, the best one is kept')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='Results table, CSV unless it ends with .json')
+    parser.add_argument('--baseline', default=None, help='Earlier JSON results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed throughput drop against the baseline')
+    args = parser.parse_args()
+
+    traces = args.traces or sorted(glob.glob(TRACES))
+    results = benchmark(grid(args.model, traces, args.d, args.front_size, args.main_size, args.front_policy,
+                             args.main_policy, args.frequencies, args.bucket_hash, args.second_hash),
+                        args.repeat)
+    write_results(results, args.output, BENCHMARK_FIELDS)
+    for result in results:
+        print('%s: %.4f hit ratio, %.0f requests/s, %.1f bytes/element, %d admission bytes' % (
+            cell_name(result), result['hit_ratio'], result['requests_per_second'], result['bytes_per_element'],
+            result['admission_bytes']))
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(regression)
+        sys.exit(1 if found else 0)
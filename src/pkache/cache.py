@@ -0,0 +1,191 @@
+from array import array
+
+from pkache.hashing import make_bucket_hash
+from pkache.policies import FIFO, LFU, LRU, POLICIES, LFU_COUNTERS, LRU_COUNTERS, ACCESS_COUNTS
+
+
+class Element:
+    __slots__ = ('key', 'lfu_counter', 'lru_counter', 'insertion_time', 'n')
+
+    def __init__(self, key, lfu_counter, lru_counter, insertion_time, n):
+        self.key = key
+        self.lfu_counter = lfu_counter
+        self.lru_counter = lru_counter
+        self.insertion_time = insertion_time
+        self.n = n
+
+
+class Cache:
+    def __init__(self, size, d, policy, track=None, options=None, bucket_hash=None, second_hash=None):
+        self.d = d
+        self.size = size
+        self.policy = policy
+        # key -> bucket, key % d unless another pkache.hashing spec is given
+        self.bucket = make_bucket_hash(bucket_hash, d)
+        # Two-choice placement: with a second_hash spec a key may live in either of its two buckets, lookups go
+        # through index so only inserts need to pick one, see choose_bucket(). The methods taking a bucket let a
+        # caller that picks it itself, like TwoTier, override the choice.
+        self.second_bucket = make_bucket_hash(second_hash, d) if second_hash else None
+        # Struct-of-arrays storage, bucket b owns slots [b * size, (b + 1) * size). Keys get 64 bits so 8 byte
+        # packed traces replay, the counters are request counts and timestamps and fit 32.
+        self.keys = array('Q', [0]) * (d * size)
+        self.lfu_counters = array('I', [0]) * (d * size)
+        self.lru_counters = array('I', [0]) * (d * size)
+        self.insertion_times = array('I', [0]) * (d * size)
+        self.n = array('I', [0]) * (d * size)
+        self.fill = array('I', [0]) * d
+        self.heads = array('I', [0]) * d
+        # key -> slot, kept in sync on insert/evict
+        self.index = dict()
+        # The policy's hooks are bound once here so the per-request path never dispatches on it
+        self.strategy = POLICIES[policy](self, **(options or {}))
+        self.choose_victim = self.strategy.choose_victim
+        self.on_hit = self.strategy.on_hit
+        self.on_insert = self.strategy.on_insert
+        self.on_evict = self.strategy.on_evict
+        # Policies whose counters touch() keeps up to date, defaults to our own
+        counters = set(self.strategy.counters)
+        for name in track or '':
+            counters.update(POLICIES[name].counters)
+        self.track_lfu = LFU_COUNTERS in counters
+        self.track_lru = LRU_COUNTERS in counters
+        self.track_n = ACCESS_COUNTS in counters
+        # choose_bucket() breaks ties on LRU stamps
+        self.track_lru = self.track_lru or second_hash is not None
+
+    def is_key_in_cache(self, key):
+        return key in self.index
+
+    def element_at(self, slot):
+        return Element(self.keys[slot], self.lfu_counters[slot], self.lru_counters[slot], self.insertion_times[slot], self.n[slot])
+
+    def write_slot(self, slot, key, lfu_counter, lru_counter, insertion_time, n):
+        self.keys[slot] = key
+        self.lfu_counters[slot] = lfu_counter
+        self.lru_counters[slot] = lru_counter
+        self.insertion_times[slot] = insertion_time
+        self.n[slot] = n
+
+    def place(self, key, timestamp=None):
+        # Bucket a new key goes to
+        if self.second_bucket is None:
+            return self.bucket(key)
+        return self.choose_bucket(key, timestamp)
+
+    def victim_stamp(self, bucket, timestamp):
+        # LRU stamp of the element bucket evicts next, 0 while it has room like the empty last slot of the P4
+        # shift register
+        if self.fill[bucket] < self.size:
+            return 0
+        return self.lru_counters[bucket * self.size + self.choose_victim(bucket, timestamp)]
+
+    def choose_bucket(self, key, timestamp):
+        # TWO_CHOICE_TEMPLATE of pKway-single/generate_file.py: the emptier of key's two buckets, on a tie the one
+        # whose next victim was touched longer ago, then the first
+        first = self.bucket(key)
+        second = self.second_bucket(key)
+        fill = self.fill
+        if fill[first] != fill[second]:
+            return first if fill[first] < fill[second] else second
+        if first != second and self.victim_stamp(second, timestamp) < self.victim_stamp(first, timestamp):
+            return second
+        return first
+
+    def get_element(self, key, position=None, bucket=None):
+        if bucket is None:
+            bucket = self.place(key)
+        if self.fill[bucket] == 0:
+            return None
+        if position:
+            return self.element_at(bucket * self.size + position)
+        elif self.policy == FIFO:
+            return self.element_at(bucket * self.size + self.heads[bucket])
+        else:
+            return self.element_at(bucket * self.size + self.fill[bucket] - 1)
+
+    def update_element_lfu_counter(self, key):
+        slot = self.index.get(key)
+        if slot is not None:
+            self.lfu_counters[slot] += 1
+            if self.on_hit:
+                self.on_hit(slot)
+
+    def update_element_lru_counter(self, key, timestamp):
+        slot = self.index.get(key)
+        if slot is not None:
+            self.lru_counters[slot] = timestamp
+            if self.on_hit:
+                self.on_hit(slot)
+
+    def update_element_hyper_counter(self, key):
+        slot = self.index.get(key)
+        if slot is not None:
+            self.n[slot] += 1
+
+    def touch(self, key, timestamp):
+        slot = self.index.get(key)
+        if slot is None:
+            return False
+        if self.track_lfu:
+            self.lfu_counters[slot] += 1
+        if self.track_lru:
+            self.lru_counters[slot] = timestamp
+        if self.track_n:
+            self.n[slot] += 1
+        if self.on_hit:
+            self.on_hit(slot)
+        return True
+
+    def get_element_position_with_minimum_lfu_counter(self, key, bucket=None):
+        if bucket is None:
+            bucket = self.place(key)
+        if self.policy == LFU:
+            return self.choose_victim(bucket, None)
+        min = 2 ** 32 - 1
+        pos = 0
+        base = bucket * self.size
+        for i in range(self.fill[bucket]):
+            if self.lfu_counters[base + i] <= min:
+                pos = i
+                min = self.lfu_counters[base + i]
+        return pos
+
+    def get_element_position_with_minimum_lru_counter(self, key, bucket=None):
+        if bucket is None:
+            bucket = self.place(key)
+        if self.policy == LRU:
+            return self.choose_victim(bucket, None)
+        min = 2 ** 32 - 1
+        pos = 0
+        base = bucket * self.size
+        for i in range(self.fill[bucket]):
+            if self.lru_counters[base + i] <= min:
+                pos = i
+                min = self.lru_counters[base + i]
+        return pos
+
+    def is_cache_full(self, key, bucket=None):
+        if bucket is None:
+            bucket = self.place(key)
+        return self.fill[bucket] == self.size
+
+    def insert_to_cache(self, key, lfu_counter, lru_counter, insertion_time, n, timestamp, bucket=None):
+        if bucket is None:
+            bucket = self.bucket(key) if self.second_bucket is None else self.choose_bucket(key, timestamp)
+        base = bucket * self.size
+        count = self.fill[bucket]
+        if count < self.size:
+            slot = base + count
+            self.fill[bucket] = count + 1
+            victim = None
+        else:
+            slot = base + self.choose_victim(bucket, timestamp)
+            victim = self.element_at(slot)
+            del self.index[victim.key]
+            if self.on_evict:
+                self.on_evict(slot)
+        self.write_slot(slot, key, lfu_counter, lru_counter, insertion_time, n)
+        self.index[key] = slot
+        if self.on_insert:
+            self.on_insert(slot)
+        return victim
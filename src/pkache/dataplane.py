@@ -0,0 +1,262 @@
+import argparse
+
+import numpy
+
+from pkache.batch import HIT_FRONT, HIT_MAIN, MISS, lockstep
+from pkache.hashing import BUCKET_HASHES, bucket_array
+from pkache.policies import FIFO, LFU, LRU
+from pkache.traces import read_keys
+
+# Fewest buckets a lockstep step is worth running for, see DataPlane.run()
+LOCKSTEP_ROWS = 32
+
+
+class PackedRegister:
+    # One tier of cahceway.p4: r_<tier>_cache packs size elements of key ++ LRU ++ LFU per bucket and
+    # r_<tier>_keys packs the same keys again for the TCAM lookup. Each bit slice is held as its own
+    # max_entries x size column, slot i being bits [ELEMENT_SIZE * (i + 1) - 1:ELEMENT_SIZE * i].
+    def __init__(self, max_entries, size, key_size, counter_size):
+        self.size = size
+        self.key_size = key_size
+        self.counter_size = counter_size
+        self.keys = numpy.zeros((max_entries, size), dtype=numpy.uint64)
+        self.element_keys = numpy.zeros((max_entries, size), dtype=numpy.uint64)
+        self.lru_counters = numpy.zeros((max_entries, size), dtype=numpy.uint64)
+        self.lfu_counters = numpy.zeros((max_entries, size), dtype=numpy.uint64)
+
+    def element(self, h):
+        # The bit<ELEMENT_SIZE * size> value r_<tier>_cache.read() returns for bucket h
+        element_size = 2 * self.counter_size + self.key_size
+        value = 0
+        for i in range(self.size):
+            slot = ((int(self.element_keys[h, i]) << 2 * self.counter_size) |
+                    (int(self.lru_counters[h, i]) << self.counter_size) | int(self.lfu_counters[h, i]))
+            value |= slot << element_size * i
+        return value
+
+    def keys_bit(self, h):
+        # The bit<KEY_SIZE * size> value r_<tier>_keys.read() returns for bucket h
+        value = 0
+        for i in range(self.size):
+            value |= int(self.keys[h, i]) << self.key_size * i
+        return value
+
+    def slot(self, rows, i):
+        return self.element_keys[rows, i], self.lfu_counters[rows, i], self.lru_counters[rows, i], self.keys[rows, i]
+
+    def write_slot(self, rows, i, element_key, lfu_counter, lru_counter, key):
+        self.element_keys[rows, i] = element_key
+        self.lfu_counters[rows, i] = lfu_counter
+        self.lru_counters[rows, i] = lru_counter
+        self.keys[rows, i] = key
+
+    def row(self, h):
+        # Bucket h as Python lists in slot() order, for replaying one bucket request by request
+        return (self.element_keys[h].tolist(), self.lfu_counters[h].tolist(), self.lru_counters[h].tolist(),
+                self.keys[h].tolist())
+
+    def write_row(self, h, row):
+        self.element_keys[h], self.lfu_counters[h], self.lru_counters[h], self.keys[h] = row
+
+    def get_element(self, rows, keys, timestamps, mask):
+        # check_<tier>_cache hit mask and the get_element_from_<tier>_cache() calls: every slot holding the
+        # requested key is updated, so duplicates and empty slots matching key 0 all count
+        match = self.keys[rows] == keys[:, None]
+        hit = match.any(axis=1)
+        rows, match, timestamps = rows[hit], match[hit], timestamps[hit]
+        self.lfu_counters[rows] = numpy.where(match, (self.lfu_counters[rows] + 1) & mask, self.lfu_counters[rows])
+        self.lru_counters[rows] = numpy.where(match, timestamps[:, None], self.lru_counters[rows])
+        return hit
+
+    def insert(self, rows, victim, timestamps, policy):
+        # insert_to_<tier>_cache() on slot 0 and the <tier>_actions chain, victim is the r_victim_element
+        # slices followed by r_victim_key. Returns the final victim and the victim each slot's action read
+        # last, which is what the main cache filter sees as current_victim.
+        current = victim
+        element_key, lfu_counter, lru_counter, key = victim
+        victim = self.slot(rows, 0)
+        self.write_slot(rows, 0, element_key, lfu_counter, timestamps, key)
+        for i in range(1, self.size):
+            current = victim
+            victim_element_key, victim_lfu_counter, victim_lru_counter, victim_key = victim
+            insert = victim_key != 0
+            if policy == LFU:
+                insert &= ~(self.lfu_counters[rows, i] > victim_lfu_counter)
+            elif policy == LRU:
+                insert &= ~(self.lru_counters[rows, i] > victim_lru_counter)
+            old = self.slot(rows, i)
+            self.write_slot(rows[insert], i, victim_element_key[insert], victim_lfu_counter[insert],
+                            timestamps[insert], victim_key[insert])
+            victim = tuple(numpy.where(insert, o, v) for o, v in zip(old, victim))
+        return victim, current
+
+
+def insert_row(row, victim, timestamp, policy):
+    # PackedRegister.insert() for a single bucket held as PackedRegister.row() lists
+    element_keys, lfu_counters, lru_counters, keys = row
+    current = victim
+    next_victim = (element_keys[0], lfu_counters[0], lru_counters[0], keys[0])
+    element_keys[0], lfu_counters[0], lru_counters[0], keys[0] = victim[0], victim[1], timestamp, victim[3]
+    victim = next_victim
+    for i in range(1, len(keys)):
+        current = victim
+        if not victim[3] or (policy == LFU and lfu_counters[i] > victim[1]) or \
+                (policy == LRU and lru_counters[i] > victim[2]):
+            continue
+        next_victim = (element_keys[i], lfu_counters[i], lru_counters[i], keys[i])
+        element_keys[i], lfu_counters[i], lru_counters[i], keys[i] = victim[0], victim[1], timestamp, victim[3]
+        victim = next_victim
+    return victim, current
+
+
+def get_element_row(row, key, timestamp, mask):
+    element_keys, lfu_counters, lru_counters, keys = row
+    for i, k in enumerate(keys):
+        if k == key:
+            lfu_counters[i] = (lfu_counters[i] + 1) & mask
+            lru_counters[i] = timestamp
+
+
+class DataPlane:
+    # Register-level emulator of the cahceway.p4 that pKway-multi/generate_file.py emits, main_size=0 gives
+    # the pKway-single program. Fields wrap at key_size and counter_size bits like the bit<> registers,
+    # keys are truncated to the header's bit<KEY_SIZE> k and r_counter has 2 ** key_size - 1 cells, so
+    # the last key reads 0 and its writes are dropped. r_victim_element and r_victim_key are rewritten
+    # before they are read on every miss, so they are kept per request rather than as global registers.
+    def __init__(self, max_entries, front_size, main_size=0, front_type=FIFO, main_type=LFU, key_size=16,
+                 counter_size=32, bucket_hash=None):
+        self.max_entries = max_entries
+        # The generate_file.py bucket hash of the program, it sees the bit<KEY_SIZE> k unless told otherwise
+        self.bucket_hash = bucket_hash
+        self.front_type = front_type
+        self.main_type = main_type
+        self.key_size = key_size
+        self.counter_size = counter_size
+        self.key_mask = numpy.uint64(2 ** key_size - 1)
+        self.counter_mask = numpy.uint64(2 ** counter_size - 1)
+        # One spare cell past the end of r_counter absorbs the out of range key
+        self.r_counter = numpy.zeros(2 ** key_size, dtype=numpy.uint64)
+        self.r_timestamp = 0
+        self.front = PackedRegister(max_entries, front_size, key_size, counter_size)
+        self.main = PackedRegister(max_entries, main_size, key_size, counter_size) if main_size else None
+
+    def run(self, keys):
+        # Returns (hit front, hit main, miss) like Simulator.run(), self.outcomes holds the per request result
+        keys = numpy.asarray(keys, dtype=numpy.uint64) & self.key_mask
+        self.outcomes = numpy.zeros(len(keys), dtype=numpy.int8)
+        first = self.r_timestamp
+        buckets = self.buckets(keys)
+        # Lockstep steps cost the same however few buckets are left in them, so once fewer than
+        # LOCKSTEP_ROWS buckets have requests left each of those finishes on its own
+        for r, (rows, positions) in enumerate(lockstep(buckets, self.max_entries)):
+            if len(rows) < LOCKSTEP_ROWS:
+                for h in rows.tolist():
+                    positions = numpy.flatnonzero(buckets == h)[r:]
+                    timestamps = (positions + first + 1) & int(self.counter_mask)
+                    self.replay_bucket(h, keys[positions].tolist(), timestamps.tolist(), positions)
+                break
+            timestamps = (positions.astype(numpy.uint64) + numpy.uint64(first + 1)) & self.counter_mask
+            self.step(rows, keys[positions], timestamps, positions)
+        self.r_timestamp = (first + len(keys)) & int(self.counter_mask)
+        return (int((self.outcomes == HIT_FRONT).sum()), int((self.outcomes == HIT_MAIN).sum()),
+                int((self.outcomes == MISS).sum()))
+
+    def buckets(self, keys):
+        # h for every key, keys as the data plane sees them
+        return bucket_array(self.bucket_hash, numpy.asarray(keys, dtype=numpy.uint64) & self.key_mask,
+                            self.max_entries, self.key_size)
+
+    def read_counter(self, key):
+        return int(self.r_counter[key]) if key < len(self.r_counter) - 1 else 0
+
+    def replay_bucket(self, h, keys, timestamps, positions):
+        # step() for a run of requests to bucket h, on Python ints. Keys only ever live in their own bucket,
+        # so the r_counter cells it touches are cached locally and written back at the end.
+        counter_mask = int(self.counter_mask)
+        counters = dict()
+        read_counter = self.read_counter
+        front = self.front.row(h)
+        main = self.main.row(h) if self.main else None
+        outcomes = []
+        for key, timestamp in zip(keys, timestamps):
+            if key < len(self.r_counter) - 1:
+                counters[key] = ((counters[key] if key in counters else read_counter(key)) + 1) & counter_mask
+            if main and key in main[3]:
+                get_element_row(main, key, timestamp, counter_mask)
+                outcomes.append(HIT_MAIN)
+                continue
+            if key in front[3]:
+                get_element_row(front, key, timestamp, counter_mask)
+                outcomes.append(HIT_FRONT)
+                continue
+            outcomes.append(MISS)
+            victim = insert_row(front, (key, 1, timestamp, key), timestamp, self.front_type)[0]
+            if not main or not victim[3]:
+                continue
+            victim, current = insert_row(main, victim, timestamp, self.main_type)
+            if victim[3]:
+                first_counter = counters[current[0]] if current[0] in counters else read_counter(current[0])
+                second_counter = counters[main[0][0]] if main[0][0] in counters else read_counter(main[0][0])
+                if second_counter < first_counter:
+                    main[0][0], main[1][0], main[2][0], main[3][0] = current[0], current[1], current[2], current[0]
+        self.front.write_row(h, front)
+        if main:
+            self.main.write_row(h, main)
+        for key, count in counters.items():
+            self.r_counter[key] = count
+        self.outcomes[positions] = outcomes
+
+    def step(self, rows, keys, timestamps, positions):
+        front, main, r_counter = self.front, self.main, self.r_counter
+        r_counter[keys] = (r_counter[keys] + 1) & self.counter_mask
+        r_counter[-1] = 0
+
+        if main:
+            hit = main.get_element(rows, keys, timestamps, self.counter_mask)
+            self.outcomes[positions[hit]] = HIT_MAIN
+            rows, keys, timestamps, positions = rows[~hit], keys[~hit], timestamps[~hit], positions[~hit]
+
+        hit = front.get_element(rows, keys, timestamps, self.counter_mask)
+        self.outcomes[positions[hit]] = HIT_FRONT
+        rows, keys, timestamps = rows[~hit], keys[~hit], timestamps[~hit]
+
+        one = numpy.ones(len(rows), dtype=numpy.uint64)
+        victim = front.insert(rows, (keys, one, timestamps, keys), timestamps, self.front_type)[0]
+        if not main:
+            return
+
+        evicted = victim[3] != 0
+        rows, timestamps = rows[evicted], timestamps[evicted]
+        victim, current = main.insert(rows, [column[evicted] for column in victim], timestamps, self.main_type)
+
+        # The filter compares r_counter for the stale current_victim against the key now in main slot 0
+        filter = victim[3] != 0
+        rows = rows[filter]
+        current = [column[filter] for column in current]
+        first_counter = r_counter[current[0]]
+        second_counter = r_counter[main.element_keys[rows, 0]]
+        undo = second_counter < first_counter
+        element_key, lfu_counter, lru_counter = [column[undo] for column in current[:3]]
+        main.write_slot(rows[undo], 0, element_key, lfu_counter, lru_counter, element_key)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a trace through the emulated cahceway.p4 registers')
+    parser.add_argument('trace')
+    parser.add_argument('--max-entries', type=int, default=16, help='MAX_ENTRIES, the number of buckets')
+    parser.add_argument('--front-size', type=int, default=4)
+    parser.add_argument('--main-size', type=int, default=16, help='0 emulates the pKway-single program')
+    parser.add_argument('--front-type', choices=(LFU, FIFO, LRU), default=FIFO)
+    parser.add_argument('--main-type', choices=(LFU, FIFO, LRU), default=LFU)
+    parser.add_argument('--key-size', type=int, default=16)
+    parser.add_argument('--counter-size', type=int, default=32)
+    parser.add_argument('--bucket-hash', choices=BUCKET_HASHES, default=None)
+    args = parser.parse_args()
+
+    data_plane = DataPlane(args.max_entries, args.front_size, args.main_size, args.front_type, args.main_type,
+                           args.key_size, args.counter_size, args.bucket_hash)
+    hit_front, hit_main, hit_miss = data_plane.run(list(read_keys(args.trace)))
+    print('Hit front ', hit_front)
+    print('Hit main ', hit_main)
+    print('Hit miss ', hit_miss)
+    print((hit_front + hit_main) / (hit_front + hit_main + hit_miss))
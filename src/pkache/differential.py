@@ -0,0 +1,129 @@
+import argparse
+from array import array
+
+import numpy
+
+from pkache.batch import HIT_FRONT, HIT_MAIN, MISS
+from pkache.dataplane import DataPlane
+from pkache.hashing import BUCKET_HASHES
+from pkache.policies import FIFO, LFU, LRU
+from pkache.simulator import SINGLE, TWO_TIER, make_simulator
+from pkache.traces import read_keys
+
+OUTCOMES = {(1, 0, 0): HIT_FRONT, (0, 1, 0): HIT_MAIN, (0, 0, 1): MISS}
+NAMES = {HIT_FRONT: 'front', HIT_MAIN: 'main', MISS: 'miss'}
+
+
+def simulator_outcomes(simulator, keys):
+    # Per request outcome codes of process_key(), in the same encoding as DataPlane.outcomes
+    outcomes = array('b')
+    process_key = simulator.process_key
+    for i, key in enumerate(keys):
+        outcomes.append(OUTCOMES[process_key(key, i)])
+    return numpy.frombuffer(outcomes, dtype=numpy.int8)
+
+
+def cached_keys(simulator, data_plane, bucket):
+    # (simulator keys, data plane keys) held in bucket across both tiers, empty data plane slots are dropped
+    tiers = [simulator.front] + ([simulator.main] if hasattr(simulator, 'main') else [])
+    simulated = set()
+    for cache in tiers:
+        base = bucket * cache.size
+        simulated.update(cache.keys[base:base + cache.fill[bucket]])
+    registers = [data_plane.front] + ([data_plane.main] if data_plane.main else [])
+    emulated = set(int(key) for register in registers for key in register.keys[bucket] if key)
+    return simulated, emulated
+
+
+def compare(simulator_factory, data_plane_factory, keys):
+    # Replays keys through a fresh simulator and data plane from the two factories. Returns None when every
+    # outcome agrees, otherwise the first divergent request, how the two bucket contents differ right before
+    # and right after it and the per bucket mismatch counts.
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    simulator = simulator_factory()
+    data_plane = data_plane_factory()
+    simulated = simulator_outcomes(simulator, keys.tolist())
+    data_plane.run(keys)
+    emulated = data_plane.outcomes
+    mismatches = numpy.flatnonzero(simulated != emulated)
+    if not len(mismatches):
+        return None
+    d = data_plane.max_entries
+    first = int(mismatches[0])
+    buckets = data_plane.buckets(keys)
+    bucket = int(buckets[first])
+
+    # Both models are replayed again up to the divergent request to show what the bucket held when it came
+    # in, both usually insert its key so the contents after it mostly differ the same way
+    simulator = simulator_factory()
+    data_plane = data_plane_factory()
+    simulator.run(keys[:first].tolist())
+    data_plane.run(keys[:first])
+    simulated_keys, emulated_keys = cached_keys(simulator, data_plane, bucket)
+    simulator.process_key(int(keys[first]), first)
+    data_plane.run(keys[first:first + 1])
+    simulated_after, emulated_after = cached_keys(simulator, data_plane, bucket)
+    return dict(
+        request=first,
+        key=int(keys[first]),
+        bucket=bucket,
+        simulator=NAMES[simulated[first]],
+        data_plane=NAMES[emulated[first]],
+        simulator_only=sorted(simulated_keys - emulated_keys),
+        data_plane_only=sorted(emulated_keys - simulated_keys),
+        simulator_only_after=sorted(simulated_after - emulated_after),
+        data_plane_only_after=sorted(emulated_after - simulated_after),
+        mismatches=len(mismatches),
+        requests=len(keys),
+        bucket_mismatches=numpy.bincount(buckets[mismatches], minlength=d).tolist(),
+        bucket_requests=numpy.bincount(buckets, minlength=d).tolist(),
+    )
+
+
+def print_report(report):
+    if report is None:
+        print('No divergence')
+        return
+    print('First divergence at request %(request)d: key %(key)d in bucket %(bucket)d, '
+          'simulator %(simulator)s, data plane %(data_plane)s' % report)
+    print('Before it, only in simulator ', report['simulator_only'])
+    print('Before it, only in data plane ', report['data_plane_only'])
+    print('After it, only in simulator ', report['simulator_only_after'])
+    print('After it, only in data plane ', report['data_plane_only_after'])
+    print('Mismatches ', report['mismatches'], 'of', report['requests'])
+    print('bucket,requests,mismatches')
+    for bucket, (requests, mismatches) in enumerate(zip(report['bucket_requests'], report['bucket_mismatches'])):
+        if mismatches:
+            print('%d,%d,%d' % (bucket, requests, mismatches))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a trace through the simulator and the emulated '
+                                                 'cahceway.p4 and report where they disagree')
+    parser.add_argument('trace')
+    parser.add_argument('--model', choices=(SINGLE, TWO_TIER), default=TWO_TIER)
+    parser.add_argument('-d', type=int, default=16, help='Number of buckets, MAX_ENTRIES in the P4 program')
+    parser.add_argument('--front-size', type=int, default=4)
+    parser.add_argument('--main-size', type=int, default=16)
+    parser.add_argument('--front-policy', choices=(LFU, FIFO, LRU), default=None)
+    parser.add_argument('--main-policy', choices=(LFU, FIFO, LRU), default=LFU)
+    parser.add_argument('--key-size', type=int, default=16)
+    parser.add_argument('--counter-size', type=int, default=32)
+    parser.add_argument('--bucket-hash', choices=BUCKET_HASHES, default=None,
+                        help='Used by both models, the simulator hashes --key-size bits of the key like the P4')
+    args = parser.parse_args()
+    bucket_hash = '%s:%d' % (args.bucket_hash, args.key_size) if args.bucket_hash else None
+
+    if args.model == SINGLE:
+        front_policy = args.front_policy or LRU
+        main_size = 0
+    else:
+        front_policy = args.front_policy or FIFO
+        main_size = args.main_size
+    report = compare(
+        lambda: make_simulator(args.model, args.d, args.front_size, main_size, front_policy, args.main_policy,
+                               bucket_hash=bucket_hash),
+        lambda: DataPlane(args.d, args.front_size, main_size, front_policy, args.main_policy, args.key_size,
+                          args.counter_size, bucket_hash),
+        list(read_keys(args.trace)))
+    print_report(report)
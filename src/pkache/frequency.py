@@ -0,0 +1,127 @@
+import random
+from array import array
+
+EXACT = 'exact'
+COUNT_MIN = 'cm'  # cm:<width>:<depth>
+CONSERVATIVE_COUNT_MIN = 'cmcu'  # cmcu:<width>:<depth>, Count-Min with conservative update
+
+# <estimator>/age:<period>:<slice>[:<slots>], see AgingEstimator. Exact counters age every key whose
+# key % slots falls in the slice, the way r_counter truncates keys to its index.
+AGING = 'age'
+
+# Mersenne prime for the per-row (a * key + b) mod p hashes
+PRIME = 2 ** 61 - 1
+
+# r_counter in generate_file.py has one slot per 16 bit key
+KEY_SLOTS = 2 ** 16
+
+
+class ExactCounter:
+    # The original GLOBAL_COUNTER, one entry per distinct key. Keys are also listed under their r_counter slot,
+    # key % slots, so aging a range of slots reaches keys of any size.
+    def __init__(self, slots=KEY_SLOTS):
+        self.counts = dict()
+        self.slots = slots
+        self.slot_keys = dict()
+
+    def increment(self, key):
+        counts = self.counts
+        value = counts.get(key)
+        if value is None:
+            self.slot_keys.setdefault(key % self.slots, []).append(key)
+            counts[key] = 1
+        else:
+            counts[key] = value + 1
+
+    def estimate(self, key):
+        return self.counts.get(key, 0)
+
+    def age(self, start, stop):
+        counts = self.counts
+        slot_keys = self.slot_keys
+        for slot in range(start, stop):
+            for key in slot_keys.get(slot, ()):
+                counts[key] >>= 1
+
+
+class CountMinSketch:
+    # depth rows of width counters, memory stays constant however many keys the trace has
+    def __init__(self, width, depth=4, conservative=False, seed=0):
+        self.width = width
+        self.depth = depth
+        self.conservative = conservative
+        rng = random.Random(seed)
+        self.hashes = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for i in range(depth)]
+        self.rows = [array('I', [0]) * width for i in range(depth)]
+        self.slots = width
+
+    def positions(self, key):
+        return [(a * key + b) % PRIME % self.width for a, b in self.hashes]
+
+    def increment(self, key):
+        positions = self.positions(key)
+        if self.conservative:
+            # Only raise the counters that are at the current estimate
+            value = min(row[i] for row, i in zip(self.rows, positions)) + 1
+            for row, i in zip(self.rows, positions):
+                if row[i] < value:
+                    row[i] = value
+        else:
+            for row, i in zip(self.rows, positions):
+                row[i] += 1
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self.positions(key)))
+
+    def age(self, start, stop):
+        for row in self.rows:
+            for i in range(start, stop):
+                row[i] >>= 1
+
+
+class AgingEstimator:
+    # Software model of the deamortization process in generate_file.py: every period requests the counters in
+    # the next slice_size slots are halved, the cursor wrapping around so every counter ages once per cycle.
+    # The generator's schedule is period 8 with a slice of 2 ** key_size / (max_entries * main_cache_size).
+    def __init__(self, estimator, period, slice_size, slots=None):
+        self.estimator = estimator
+        self.period = period
+        self.slots = slots or estimator.slots
+        self.slice_size = slice_size
+        self.cursor = 0
+        self.requests = 0
+
+    def increment(self, key):
+        self.estimator.increment(key)
+        self.requests += 1
+        if self.requests % self.period == 0:
+            stop = min(self.cursor + self.slice_size, self.slots)
+            self.estimator.age(self.cursor, stop)
+            self.cursor = stop % self.slots
+
+    def estimate(self, key):
+        return self.estimator.estimate(key)
+
+
+def make_frequency_estimator(spec=None):
+    spec, _, aging = (spec or EXACT).partition('/')
+    name, *schedule = aging.split(':')
+    if aging and name != AGING:
+        raise ValueError('Unknown aging schedule %s' % aging)
+    if aging and len(schedule) not in (2, 3):
+        raise ValueError('Aging schedule %s is not age:<period>:<slice>[:<slots>]' % aging)
+    schedule = list(map(int, schedule))
+    if spec == EXACT:
+        # A custom slot count also sets how keys map to slots
+        estimator = ExactCounter(*schedule[2:3])
+    else:
+        name, width, depth = spec.split(':')
+        if name not in (COUNT_MIN, CONSERVATIVE_COUNT_MIN):
+            raise ValueError('Unknown frequency estimator %s' % spec)
+        estimator = CountMinSketch(int(width), int(depth), conservative=name == CONSERVATIVE_COUNT_MIN)
+        # A sketch ages its columns, so its slots are its width
+        if len(schedule) == 3 and schedule[2] != estimator.width:
+            raise ValueError('%s ages its %d columns, not %d slots' % (spec, estimator.width, schedule[2]))
+    if aging:
+        estimator = AgingEstimator(estimator, *schedule)
+    return estimator
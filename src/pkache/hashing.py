@@ -0,0 +1,115 @@
+import zlib
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MODULO = 'mod'
+MULTIPLICATIVE = 'mul'
+CRC16 = 'crc16'
+CRC32 = 'crc32'
+XOR_FOLD = 'xor'
+BUCKET_HASHES = (MODULO, MULTIPLICATIVE, CRC16, CRC32, XOR_FOLD)
+
+# Bits of the key the hashes see, wider keys are hashed on their low 32 bits (key % d still sees all of them).
+# The generated P4 hashes the bit<KEY_SIZE> header field, so crc16:16 / crc32:16 reproduce its buckets.
+KEY_BITS = 32
+# 2 ** 32 / golden ratio, Knuth's multiplicative constant
+GOLDEN = 0x9E3779B1
+
+
+def crc_table(polynomial, width):
+    # Reflected CRC lookup table
+    table = array('I' if width > 16 else 'H')
+    for byte in range(256):
+        crc = byte
+        for i in range(8):
+            crc = (crc >> 1) ^ polynomial if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+# bmv2's crc16 is CRC-16/ARC (polynomial 0x8005, reflected, zero init), its crc32 the zlib CRC-32
+CRC16_TABLE = crc_table(0xA001, 16)
+CRC32_TABLE = crc_table(0xEDB88320, 32)
+
+
+def crc16(data):
+    crc = 0
+    for byte in data:
+        crc = (crc >> 8) ^ CRC16_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def add_bucket_hash_argument(parser, multiple=False):
+    # --bucket-hash of the CLIs, a list of specs to sweep over with multiple
+    parser.add_argument('--bucket-hash', nargs='+' if multiple else None, default=[None] if multiple else None,
+                        help='<name>[:<key bits>] with name one of %s, key mod d by default' % ', '.join(BUCKET_HASHES))
+
+
+def add_second_hash_argument(parser, multiple=False):
+    # --second-hash of the CLIs, see add_bucket_hash_argument()
+    parser.add_argument('--second-hash', nargs='+' if multiple else None, default=[None] if multiple else None,
+                        help='Bucket hash of each key\'s second bucket, enables two-choice placement')
+
+
+def parse_bucket_hash(spec, key_bits=KEY_BITS):
+    # '<name>[:<key bits>]', None is the plain key % d
+    if not spec:
+        return MODULO, key_bits
+    fields = spec.split(':')
+    if fields[0] not in BUCKET_HASHES or len(fields) > 2:
+        raise ValueError('Unknown bucket hash %s' % spec)
+    return fields[0], int(fields[1]) if len(fields) > 1 else key_bits
+
+
+def make_bucket_hash(spec, d, key_bits=KEY_BITS):
+    # key -> bucket function, each mirrors the generate_file.py BUCKET_HASH_TEMPLATES entry of the same name
+    name, key_bits = parse_bucket_hash(spec, key_bits)
+    if name == MODULO:
+        return d.__rmod__
+    mask = 2 ** key_bits - 1
+    width = (key_bits + 7) // 8
+    if name == MULTIPLICATIVE:
+        return lambda key: (((key & mask) * GOLDEN) & 0xFFFFFFFF) * d >> 32
+    elif name == XOR_FOLD:
+        def xor_fold(key):
+            x = key & mask
+            x ^= x >> 16
+            x ^= x >> 8
+            return x % d
+        return xor_fold
+    elif name == CRC16:
+        return lambda key: crc16((key & mask).to_bytes(width, 'big')) % d
+    return lambda key: zlib.crc32((key & mask).to_bytes(width, 'big')) % d
+
+
+def bucket_array(spec, keys, d, key_bits=KEY_BITS):
+    # make_bucket_hash() over a NumPy array of keys, returns int64 buckets
+    name, key_bits = parse_bucket_hash(spec, key_bits)
+    keys = numpy.asarray(keys)
+    if name == MODULO:
+        return (keys % d).astype(numpy.int64)
+    x = keys.astype(numpy.uint64) & numpy.uint64(2 ** key_bits - 1)
+    if name == MULTIPLICATIVE:
+        x = ((x * numpy.uint64(GOLDEN)) & numpy.uint64(0xFFFFFFFF)) * numpy.uint64(d) >> numpy.uint64(32)
+        return x.astype(numpy.int64)
+    elif name == XOR_FOLD:
+        x ^= x >> numpy.uint64(16)
+        x ^= x >> numpy.uint64(8)
+        return (x % numpy.uint64(d)).astype(numpy.int64)
+    # Table driven CRC over the key's big-endian bytes, one byte of every key per pass
+    if name == CRC16:
+        table = numpy.asarray(CRC16_TABLE, dtype=numpy.uint64)
+        crc = numpy.zeros(len(x), dtype=numpy.uint64)
+    else:
+        table = numpy.asarray(CRC32_TABLE, dtype=numpy.uint64)
+        crc = numpy.full(len(x), 0xFFFFFFFF, dtype=numpy.uint64)
+    for shift in reversed(range(0, (key_bits + 7) // 8 * 8, 8)):
+        byte = (x >> numpy.uint64(shift)) & numpy.uint64(0xFF)
+        crc = (crc >> numpy.uint64(8)) ^ table[((crc ^ byte) & numpy.uint64(0xFF)).astype(numpy.int64)]
+    if name == CRC32:
+        crc ^= numpy.uint64(0xFFFFFFFF)
+    return (crc % numpy.uint64(d)).astype(numpy.int64)
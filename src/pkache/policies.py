@@ -0,0 +1,192 @@
+import heapq
+import math
+import random
+from array import array
+
+LFU = 'F'
+FIFO = 'O'
+LRU = 'R'
+HYPER = 'H'
+LFU_LRU = 'L'  # LFU whose scan also requires the LRU counter not to grow, the historical single-tier LFU
+
+# Cache columns a policy reads, see Cache.__init__
+LFU_COUNTERS = 'lfu_counters'
+LRU_COUNTERS = 'lru_counters'
+ACCESS_COUNTS = 'n'
+
+POLICIES = dict()
+
+# r_log in the hyperbolic data plane, log2 scaled by 100
+LOG_SIZE = 2 ** 16
+LOG_TABLE = array('i', [0] + [int(round(math.log(x, 2) * 100)) for x in range(1, LOG_SIZE)])
+
+
+def log2_scaled(x):
+    return LOG_TABLE[x if x < LOG_SIZE else LOG_SIZE - 1]
+
+
+def register(name):
+    def decorator(cls):
+        cls.name = name
+        POLICIES[name] = cls
+        return cls
+    return decorator
+
+
+class Policy:
+    # Columns touch() must keep up to date for this policy
+    counters = ()
+    # Hooks the cache calls, None skips the call entirely
+    on_hit = None
+    on_insert = None
+    on_evict = None
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def choose_victim(self, bucket, timestamp):
+        # Position inside the (full) bucket of the element to evict, must not change the cache and must return
+        # the same position when called again for the same request
+        raise NotImplementedError
+
+
+class HeapPolicy(Policy):
+    # Per-bucket lazy-deletion heaps of (counter, -slot, key), ties go to the highest slot
+    column = None
+
+    def __init__(self, cache):
+        super().__init__(cache)
+        self.priorities = getattr(cache, self.column)
+        self.heaps = [[] for i in range(cache.d)]
+
+    def on_hit(self, slot):
+        cache = self.cache
+        bucket = slot // cache.size
+        heap = self.heaps[bucket]
+        if len(heap) > 4 * cache.size:
+            self.rebuild_heap(bucket)
+        else:
+            heapq.heappush(heap, (self.priorities[slot], -slot, cache.keys[slot]))
+
+    on_insert = on_hit
+
+    def rebuild_heap(self, bucket):
+        cache = self.cache
+        base = bucket * cache.size
+        heap = [(self.priorities[slot], -slot, cache.keys[slot]) for slot in range(base, base + cache.fill[bucket])]
+        heapq.heapify(heap)
+        self.heaps[bucket] = heap
+
+    def choose_victim(self, bucket, timestamp):
+        # Pops stale entries until the top matches the slot's current key and counter
+        keys = self.cache.keys
+        heap = self.heaps[bucket]
+        while heap:
+            value, slot, key = heap[0]
+            if keys[-slot] == key and self.priorities[-slot] == value:
+                return -slot - bucket * self.cache.size
+            heapq.heappop(heap)
+        return 0
+
+
+@register(LFU)
+class LfuPolicy(HeapPolicy):
+    counters = (LFU_COUNTERS,)
+    column = LFU_COUNTERS
+
+
+@register(LRU)
+class LruPolicy(HeapPolicy):
+    counters = (LRU_COUNTERS,)
+    column = LRU_COUNTERS
+
+
+@register(FIFO)
+class FifoPolicy(Policy):
+    # Buckets are rings, the head slot holds the oldest element
+
+    def __init__(self, cache):
+        super().__init__(cache)
+        self.heads = cache.heads
+
+    def choose_victim(self, bucket, timestamp):
+        return self.heads[bucket]
+
+    def on_evict(self, slot):
+        bucket = slot // self.cache.size
+        self.heads[bucket] = (self.heads[bucket] + 1) % self.cache.size
+
+
+@register(LFU_LRU)
+class LfuLruPolicy(Policy):
+    counters = (LFU_COUNTERS, LRU_COUNTERS)
+
+    def choose_victim(self, bucket, timestamp):
+        cache = self.cache
+        base = bucket * cache.size
+        min = 2 ** 32 - 1
+        min_lru = 2 ** 32 - 1
+        pos = 0
+        for i in range(cache.fill[bucket]):
+            if cache.lfu_counters[base + i] <= min and cache.lru_counters[base + i] <= min_lru:
+                pos = i
+                min = cache.lfu_counters[base + i]
+                min_lru = cache.lru_counters[base + i]
+        return pos
+
+
+@register(HYPER)
+class HyperbolicPolicy(Policy):
+    # Evicts the lowest n / (now - insertion time). Priorities are compared by cross-multiplication, or through
+    # the data plane's r_log table of round(log2(x) * 100) with log_table, and an element evicted in its
+    # insertion tick counts as infinitely valuable. samples limits the scan to that many random slots, drawn
+    # once per bucket and request so Cache.choose_bucket() looks at the victim insert_to_cache() evicts.
+    counters = (ACCESS_COUNTS,)
+
+    def __init__(self, cache, samples=None, log_table=False, seed=0):
+        super().__init__(cache)
+        self.samples = samples
+        self.log_table = log_table
+        self.random = random.Random(seed)
+        # Timestamp of the request the samples in drawn were taken for, bucket -> positions
+        self.drawn_at = None
+        self.drawn = dict()
+
+    def candidates(self, bucket, count, timestamp):
+        if not self.samples or self.samples >= count:
+            return range(count)
+        if timestamp != self.drawn_at:
+            self.drawn_at = timestamp
+            self.drawn = dict()
+        positions = self.drawn.get(bucket)
+        if positions is None:
+            positions = self.drawn[bucket] = self.random.sample(range(count), self.samples)
+        return positions
+
+    def choose_victim(self, bucket, timestamp):
+        cache = self.cache
+        base = bucket * cache.size
+        n = cache.n
+        insertion_times = cache.insertion_times
+        positions = self.candidates(bucket, cache.fill[bucket], timestamp)
+        pos = positions[0]
+        if self.log_table:
+            min = None
+            for i in positions:
+                age = timestamp - insertion_times[base + i]
+                if age:
+                    priority = log2_scaled(n[base + i]) - log2_scaled(age)
+                    if min is None or priority <= min:
+                        pos = i
+                        min = priority
+            return pos
+        # n / age <= min_n / min_age, starting from the scan's old 2 ** 32 - 1 bound
+        min_n = 2 ** 32 - 1
+        min_age = 1
+        for i in positions:
+            age = timestamp - insertion_times[base + i]
+            if n[base + i] * min_age <= min_n * age:
+                pos = i
+                min_n = n[base + i]
+                min_age = age
+        return pos
@@ -0,0 +1,56 @@
+import argparse
+from array import array
+
+from pkache.traces import CHUNK_SIZE, PACKED, PackedWriter, trace_format
+
+# separator, field holding the raw object id
+PRESETS = {
+    'wiki': (None, 2),  # NetCache wiki dumps, whitespace separated
+    'websearch': (b',', 1),  # WebSearch*.spc
+}
+
+
+def reindex(src, dst, separator=None, field=0, mapping=None, chunk_size=CHUNK_SIZE):
+    # Maps raw object ids to dense keys 1, 2, ... in order of first appearance
+    ids = dict()
+    with open(src, 'rb') as f, open(dst, 'wb') as out:
+        writer = PackedWriter(out) if trace_format(dst) == PACKED else None
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            keys = array('I')
+            for line in lines:
+                raw = line.split(separator)[field].strip()
+                key = ids.get(raw)
+                if key is None:
+                    key = ids[raw] = len(ids) + 1
+                keys.append(key)
+            if writer:
+                writer.write(keys)
+            else:
+                out.write(b''.join(b'%d\n' % key for key in keys))
+        if writer:
+            writer.close()
+    if mapping:
+        with open(mapping, 'wb') as f:
+            for raw, key in ids.items():
+                f.write(b'%s\t%d\n' % (raw, key))
+    return len(ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Re-index raw object ids of a trace to dense integer keys')
+    parser.add_argument('src', help='Raw trace')
+    parser.add_argument('dst', help='Output trace, packed if it ends with .%s' % PACKED)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default=None, help='Known raw trace layout')
+    parser.add_argument('--separator', default=None, help='Field separator, whitespace if omitted')
+    parser.add_argument('--field', type=int, default=0, help='Field holding the object id')
+    parser.add_argument('--mapping', default=None, help='Where to write the raw id -> key table, <dst>.map by default')
+    args = parser.parse_args()
+
+    if args.preset:
+        separator, field = PRESETS[args.preset]
+    else:
+        separator, field = args.separator and args.separator.encode(), args.field
+    print(reindex(args.src, args.dst, separator, field, args.mapping or args.dst + '.map'))
@@ -0,0 +1,64 @@
+import argparse
+import functools
+import multiprocessing
+import os
+from array import array
+
+from pkache.frequency import ExactCounter
+from pkache.hashing import add_bucket_hash_argument, make_bucket_hash
+from pkache.policies import POLICIES
+from pkache.simulator import HYPERBOLIC, SINGLE, TWO_TIER, make_simulator
+from pkache.traces import read_keys
+
+
+def run_shard(shard):
+    factory, keys, timestamps = shard
+    return factory().run(keys, timestamps)
+
+
+def run_sharded(factory, keys, d, processes=None, bucket_hash=None):
+    # With exact admission counters buckets only interact through per key counts, which are therefore per
+    # bucket too, so whole buckets are dealt to workers and each replays its requests with their original
+    # timestamps. Sketch cells are shared between keys of different buckets and aging schedules count every
+    # request, and two-choice simulators (second_hash) share keys between buckets, so none of those shard.
+    # bucket_hash must be the one the factory's simulators use.
+    probe = factory()
+    if getattr(probe, 'second_hash', None):
+        raise ValueError('Two-choice simulators cannot be sharded')
+    if not isinstance(getattr(probe, 'frequencies', ExactCounter()), ExactCounter):
+        raise ValueError('Only exact admission counters without aging can be sharded')
+    processes = min(processes or os.cpu_count(), d)
+    bucket = make_bucket_hash(bucket_hash, d)
+    shards = [(array('Q'), array('q')) for i in range(processes)]
+    for timestamp, key in enumerate(keys):
+        shard = shards[bucket(key) % processes]
+        shard[0].append(key)
+        shard[1].append(timestamp)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(run_shard, [(factory, shard_keys, timestamps) for shard_keys, timestamps in shards])
+    return tuple(map(sum, zip(*results)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a trace with buckets sharded across processes')
+    parser.add_argument('trace')
+    parser.add_argument('--model', choices=(SINGLE, TWO_TIER, HYPERBOLIC), default=TWO_TIER)
+    parser.add_argument('-d', type=int, default=16, help='Number of buckets')
+    parser.add_argument('--front-size', type=int, default=4)
+    parser.add_argument('--main-size', type=int, default=16)
+    parser.add_argument('--front-policy', choices=sorted(POLICIES), default=None)
+    parser.add_argument('--main-policy', choices=sorted(POLICIES), default=None)
+    parser.add_argument('--frequencies', default=None,
+                        help='Admission counters, only exact ones shard with the serial counts')
+    add_bucket_hash_argument(parser)
+    parser.add_argument('-j', '--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    factory = functools.partial(make_simulator, args.model, args.d, args.front_size, args.main_size,
+                                args.front_policy, args.main_policy, args.frequencies, args.bucket_hash)
+    hit_front, hit_main, hit_miss = run_sharded(factory, read_keys(args.trace), args.d, args.processes,
+                                                args.bucket_hash)
+    print('Hit front ', hit_front)
+    print('Hit main ', hit_main)
+    print('Hit miss ', hit_miss)
+    print((hit_front + hit_main) / (hit_front + hit_main + hit_miss))
@@ -0,0 +1,228 @@
+import itertools
+import json
+import time
+
+from pkache.cache import Cache
+from pkache.frequency import make_frequency_estimator
+from pkache.policies import FIFO, HYPER, LFU, LRU
+from pkache.stats import WindowSeries, instrument
+
+
+class Simulator:
+    def process_key(self, key, counter):
+        # Returns (hit front, hit main, miss)
+        raise NotImplementedError
+
+    def run(self, keys, timestamps=None):
+        # Timestamps default to the trace positions, pass them explicitly when replaying a slice of a trace
+        if timestamps is None:
+            timestamps = itertools.count()
+        hit_front = 0
+        hit_main = 0
+        hit_miss = 0
+        for i, key in zip(timestamps, keys):
+            ret = self.process_key(key, i)
+            hit_front += ret[0]
+            hit_main += ret[1]
+            hit_miss += ret[2]
+        return hit_front, hit_main, hit_miss
+
+
+class SingleTier(Simulator):
+    # pKway-single: one d-way cache
+    def __init__(self, d, front_size, front_policy=LRU, options=None, bucket_hash=None, second_hash=None):
+        self.bucket_hash = bucket_hash
+        self.second_hash = second_hash
+        self.front = Cache(front_size, d, front_policy, options=options, bucket_hash=bucket_hash,
+                           second_hash=second_hash)
+
+    def process_key(self, key, counter):
+        if self.front.touch(key, counter):
+            return (1, 0, 0)
+        self.front.insert_to_cache(key, 1, counter, counter, 1, counter)
+        return (0, 0, 1)
+
+
+class Hyperbolic(SingleTier):
+    # pKway-hyperbolicCache: one d-way cache evicting the lowest n / (now - insertion time)
+    def __init__(self, d, size, samples=None, log_table=False, bucket_hash=None, second_hash=None):
+        super().__init__(d, size, HYPER, options=dict(samples=samples, log_table=log_table),
+                         bucket_hash=bucket_hash, second_hash=second_hash)
+
+
+class TwoTier(Simulator):
+    # pKway-multi: front victims are admitted to the main cache through a frequency filter
+    def __init__(self, k, front_size, main_size, front_policy=FIFO, main_policy=LFU, frequencies=None,
+                 bucket_hash=None, second_hash=None):
+        # The admission filter compares LFU and LRU counters across the two tiers
+        # Both tiers must agree on the bucket of every key. With second_hash a miss picks one of the key's two
+        # buckets for both tiers, see choose_bucket().
+        self.bucket_hash = bucket_hash
+        self.second_hash = second_hash
+        self.main = Cache(main_size, k, main_policy, track=LFU + LRU, bucket_hash=bucket_hash,
+                          second_hash=second_hash)
+        self.front = Cache(front_size, k, front_policy, track=LFU + LRU, bucket_hash=bucket_hash,
+                           second_hash=second_hash)
+        # Request counts behind the admission filter, see pkache.frequency for the estimators
+        self.frequencies = make_frequency_estimator(frequencies)
+        if second_hash:
+            # Main cache buckets come from the front eviction, a main cache call left to pick its own is a bug
+            self.main.choose_bucket = self.unplaced
+
+    def unplaced(self, key, timestamp):
+        raise RuntimeError('Main cache call without the bucket of the front eviction')
+
+    def choose_bucket(self, key, counter):
+        # TWO_CHOICE_TEMPLATE of pKway-multi/generate_file.py: the bucket with fewer occupied slots across both
+        # tiers, on a tie the one whose next front victim was touched longer ago, then the first
+        front, main = self.front, self.main
+        first = front.bucket(key)
+        second = front.second_bucket(key)
+        load = front.fill[first] + main.fill[first]
+        second_load = front.fill[second] + main.fill[second]
+        if load != second_load:
+            return first if load < second_load else second
+        if first != second and front.victim_stamp(second, counter) < front.victim_stamp(first, counter):
+            return second
+        return first
+
+    def process_key(self, key, counter):
+        main = self.main
+        frequencies = self.frequencies
+        frequencies.increment(key)
+        if self.front.touch(key, counter):
+            return (1, 0, 0)
+        if main.touch(key, counter):
+            return (0, 1, 0)
+        # The front victim moves to the main cache bucket it was evicted from
+        bucket = self.choose_bucket(key, counter) if self.second_hash else None
+        victim = self.front.insert_to_cache(key, 1, counter, counter, 1, counter, bucket)
+        if not victim:
+            return (0, 0, 1)
+        if not main.is_cache_full(victim.key, bucket):
+            main.insert_to_cache(victim.key, victim.lfu_counter, victim.lru_counter, victim.insertion_time, victim.n, counter,
+                                 bucket)
+            return (0, 0, 1)
+        insert = True
+        if main.policy == LFU:
+            potential_victim = main.get_element(
+                victim.key, main.get_element_position_with_minimum_lfu_counter(victim.key, bucket), bucket)
+            insert = potential_victim.lfu_counter < victim.lfu_counter
+        elif main.policy == LRU:
+            potential_victim = main.get_element(
+                victim.key, main.get_element_position_with_minimum_lfu_counter(victim.key, bucket), bucket)
+            insert = potential_victim.lru_counter < victim.lru_counter
+        else:
+            potential_victim = main.get_element(victim.key, bucket=bucket)
+        if potential_victim and insert and frequencies.estimate(potential_victim.key) <= frequencies.estimate(victim.key):
+            main.insert_to_cache(victim.key, victim.lfu_counter, victim.lru_counter, victim.insertion_time, victim.n, counter,
+                                 bucket)
+        return (0, 0, 1)
+
+
+SINGLE = 'single'
+TWO_TIER = 'multi'
+HYPERBOLIC = 'hyperbolic'
+
+# Requests replay() hands to Simulator.run() at a time when reporting by wall time
+TIMED_CHUNK = 4096
+
+
+def make_simulator(model, d, front_size, main_size=None, front_policy=None, main_policy=None, frequencies=None,
+                   bucket_hash=None, second_hash=None):
+    if model == SINGLE:
+        return SingleTier(d, front_size, front_policy or LRU, bucket_hash=bucket_hash, second_hash=second_hash)
+    elif model == HYPERBOLIC:
+        return Hyperbolic(d, front_size, bucket_hash=bucket_hash, second_hash=second_hash)
+    elif model == TWO_TIER:
+        return TwoTier(d, front_size, main_size, front_policy or FIFO, main_policy or LFU, frequencies, bucket_hash,
+                       second_hash)
+    raise ValueError('Unknown model %s' % model)
+
+
+def add_replay_arguments(parser):
+    parser.add_argument('--every', type=int, default=100, help='Print progress every this many requests')
+    parser.add_argument('--seconds', type=float, default=None,
+                        help='Print progress every this many seconds of wall time instead')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print the final totals')
+    parser.add_argument('--summary', default=None, help='Write a JSON summary to this path, - for stdout')
+    parser.add_argument('--buckets', default=None,
+                        help='Count per bucket hits, misses, evictions and rejections into this CSV, .json or '
+                             '.png heatmap')
+    parser.add_argument('--series', default=None,
+                        help='Write per window hit ratio, admission and eviction rates to this CSV or .npy')
+    parser.add_argument('--window', type=int, default=1000, help='Requests per --series window')
+
+
+def print_progress(i, hit_front, hit_main, hit_miss):
+    print(i)
+    print('Hit front ', hit_front)
+    print('Hit main ', hit_main)
+    print('Hit miss ', hit_miss)
+    print((hit_front + hit_main) / i)
+
+
+def next_boundary(i, step):
+    return (i // step + 1) * step
+
+
+def replay(simulator, keys, every=100, seconds=None, quiet=False, summary=None, buckets=None, series=None,
+           window=1000):
+    # Keys are replayed through Simulator.run() in chunks so the per request loop never checks whether to
+    # report. Chunks end on multiples of `every` and of the series window. Progress goes out every `every`
+    # requests, or at the first chunk boundary after `seconds` of wall time when that is given.
+    keys = iter(keys)
+    stats = instrument(simulator) if buckets else None
+    windows = WindowSeries(simulator) if series else None
+    chunk_size = every if seconds is None else TIMED_CHUNK
+    hit_front = 0
+    hit_main = 0
+    hit_miss = 0
+    i = 0
+    start = last = time.perf_counter()
+
+    while True:
+        stop = next_boundary(i, chunk_size or TIMED_CHUNK)
+        if windows:
+            stop = min(stop, next_boundary(i, window))
+        chunk = list(itertools.islice(keys, stop - i))
+        if not chunk:
+            break
+        ret = simulator.run(chunk, range(i, i + len(chunk)))
+        hit_front += ret[0]
+        hit_main += ret[1]
+        hit_miss += ret[2]
+        i += len(chunk)
+        if windows and i % window == 0:
+            windows.record(i, hit_front + hit_main)
+
+        if quiet or not chunk_size:
+            continue
+        if seconds is None:
+            if i % every == 0:
+                print_progress(i, hit_front, hit_main, hit_miss)
+        elif time.perf_counter() - last >= seconds:
+            print_progress(i, hit_front, hit_main, hit_miss)
+            last = time.perf_counter()
+    elapsed = time.perf_counter() - start
+    if windows and i > windows.end:
+        windows.record(i, hit_front + hit_main)
+
+    print('Hit front ', hit_front)
+    print('Hit main ', hit_main)
+    print('Hit miss ', hit_miss)
+    print((hit_front + hit_main) / (hit_front + hit_main + hit_miss))
+    if summary:
+        result = dict(requests=i, hit_front=hit_front, hit_main=hit_main, hit_miss=hit_miss,
+                      hit_ratio=(hit_front + hit_main) / max(i, 1), seconds=elapsed,
+                      requests_per_second=i / elapsed if elapsed else None)
+        if summary == '-':
+            print(json.dumps(result))
+        else:
+            with open(summary, 'w') as f:
+                json.dump(result, f, indent=2)
+    if stats:
+        stats.write(buckets)
+    if windows:
+        windows.write(series)
+    return hit_front, hit_main, hit_miss
@@ -0,0 +1,49 @@
+import argparse
+import itertools
+
+from pkache.hashing import add_bucket_hash_argument, make_bucket_hash
+from pkache.traces import read_keys
+
+
+def lru_hit_counts(keys, d, max_ways, bucket_hash=None):
+    # LRU has the inclusion property, so one pass over per-bucket recency stacks gives the hits of every
+    # way count at once: a request found at depth p hits in any bucket of more than p ways.
+    bucket = make_bucket_hash(bucket_hash, d)
+    stacks = [[] for i in range(d)]
+    depths = [0] * max_ways
+    requests = 0
+    for key in keys:
+        requests += 1
+        stack = stacks[bucket(key)]
+        try:
+            depth = stack.index(key)
+        except ValueError:
+            stack.insert(0, key)
+            if len(stack) > max_ways:
+                stack.pop()
+            continue
+        depths[depth] += 1
+        if depth:
+            del stack[depth]
+            stack.insert(0, key)
+    # hits[w - 1] is the number of hits of a d x w LRU cache
+    return list(itertools.accumulate(depths)), requests
+
+
+def lru_hit_ratio_curve(keys, d, max_ways, bucket_hash=None):
+    hits, requests = lru_hit_counts(keys, d, max_ways, bucket_hash)
+    return [h / max(requests, 1) for h in hits]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Hit ratio of a d-way LRU front cache for every way count, in one pass')
+    parser.add_argument('trace')
+    parser.add_argument('-d', type=int, default=32, help='Number of buckets')
+    parser.add_argument('-W', '--max-ways', type=int, default=64, help='Largest FRONT_SIZE to report')
+    add_bucket_hash_argument(parser)
+    args = parser.parse_args()
+
+    print('front_size,hit_ratio')
+    curve = lru_hit_ratio_curve(read_keys(args.trace), args.d, args.max_ways, args.bucket_hash)
+    for ways, ratio in enumerate(curve, 1):
+        print('%d,%s' % (ways, ratio))
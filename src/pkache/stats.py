@@ -0,0 +1,153 @@
+import csv
+import json
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SERIES_FIELDS = ('start', 'requests', 'hit_ratio', 'admission_rate', 'eviction_rate')
+FIELDS = ('bucket', 'hits_front', 'hits_main', 'misses', 'evictions_front', 'evictions_main', 'rejections',
+          'occupancy_front', 'occupancy_main')
+
+
+class BucketStats:
+    # Per bucket hit, insert and eviction counts of a simulator's caches. They are counted by chaining onto
+    # the Cache hooks, so a simulator that was never passed to instrument() runs exactly the code it did.
+    def __init__(self, simulator):
+        self.front = simulator.front
+        self.main = getattr(simulator, 'main', None)
+        d = self.front.d
+        self.hits_front = array('Q', [0]) * d
+        self.inserts_front = array('Q', [0]) * d
+        self.evictions_front = array('Q', [0]) * d
+        self.hits_main = array('Q', [0]) * d
+        self.inserts_main = array('Q', [0]) * d
+        self.evictions_main = array('Q', [0]) * d
+
+    def rows(self):
+        # Every miss inserts the key into the front cache, and every front victim the main cache does not
+        # insert was turned away by the admission filter
+        rows = []
+        for bucket in range(self.front.d):
+            row = dict(bucket=bucket, hits_front=self.hits_front[bucket], misses=self.inserts_front[bucket],
+                       evictions_front=self.evictions_front[bucket], occupancy_front=self.front.fill[bucket],
+                       hits_main=0, evictions_main=0, rejections=0, occupancy_main=0)
+            if self.main:
+                row.update(hits_main=self.hits_main[bucket], evictions_main=self.evictions_main[bucket],
+                           rejections=self.evictions_front[bucket] - self.inserts_main[bucket],
+                           occupancy_main=self.main.fill[bucket])
+            rows.append(row)
+        return rows
+
+    def write(self, path):
+        # One row per bucket as CSV, or JSON when path ends with .json and a heatmap when it ends with .png
+        if path.endswith('.png'):
+            self.plot(path)
+            return
+        with open(path, 'w', newline='') as f:
+            if path.endswith('.json'):
+                json.dump(self.rows(), f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(self.rows())
+
+    def plot(self, path):
+        # Heatmap of every counter across the buckets, each row scaled to its own maximum. matplotlib is
+        # optional and slow to import, so it is only loaded here.
+        try:
+            from matplotlib import pyplot
+        except ImportError:
+            raise RuntimeError('Plotting bucket statistics needs matplotlib')
+        rows = self.rows()
+        fields = FIELDS[1:]
+        values = [[row[field] / max(max(r[field] for r in rows), 1) for row in rows] for field in fields]
+        figure, axes = pyplot.subplots(figsize=(max(len(rows) / 4, 6), len(fields) / 2 + 1))
+        image = axes.imshow(values, aspect='auto', interpolation='nearest')
+        axes.set_yticks(range(len(fields)))
+        axes.set_yticklabels(fields)
+        axes.set_xlabel('bucket')
+        figure.colorbar(image, ax=axes)
+        figure.savefig(path, bbox_inches='tight')
+        pyplot.close(figure)
+
+
+def count(hook, counts, size):
+    def counted(slot):
+        counts[slot // size] += 1
+        if hook:
+            hook(slot)
+    return counted
+
+
+def instrument(simulator):
+    # Starts counting per bucket events of simulator and returns the BucketStats holding them
+    stats = BucketStats(simulator)
+    tiers = [(simulator.front, stats.hits_front, stats.inserts_front, stats.evictions_front)]
+    if stats.main:
+        tiers.append((stats.main, stats.hits_main, stats.inserts_main, stats.evictions_main))
+    for cache, hits, inserts, evictions in tiers:
+        cache.on_hit = count(cache.on_hit, hits, cache.size)
+        cache.on_insert = count(cache.on_insert, inserts, cache.size)
+        cache.on_evict = count(cache.on_evict, evictions, cache.size)
+    return stats
+
+
+class WindowSeries:
+    # Hit ratio, main cache admissions and evictions per request for consecutive windows of a replay, see
+    # replay(). Inserts and evictions are counted through the Cache hooks like BucketStats.
+    def __init__(self, simulator):
+        self.main = getattr(simulator, 'main', None)
+        # Front evictions, main inserts and main evictions so far
+        self.events = array('Q', [0]) * 3
+        self.front = simulator.front
+        self.front.on_evict = count_event(self.front.on_evict, self.events, 0)
+        if self.main:
+            self.main.on_insert = count_event(self.main.on_insert, self.events, 1)
+            self.main.on_evict = count_event(self.main.on_evict, self.events, 2)
+        self.end = 0
+        self.hits = 0
+        self.last = array('Q', [0]) * 3
+        # One row of SERIES_FIELDS per window, flattened
+        self.values = array('d')
+
+    def record(self, end, hits):
+        # Closes the window that ends at request position end, hits counts both tiers since the start
+        requests = end - self.end
+        events = [now - before for now, before in zip(self.events, self.last)]
+        self.values.extend((self.end, requests, (hits - self.hits) / requests, events[1] / requests,
+                            (events[0] + events[2]) / requests))
+        self.end = end
+        self.hits = hits
+        self.last = array('Q', self.events)
+
+    def rows(self):
+        width = len(SERIES_FIELDS)
+        return [dict(zip(SERIES_FIELDS, self.values[i:i + width])) for i in range(0, len(self.values), width)]
+
+    def array(self):
+        # windows x len(SERIES_FIELDS) NumPy array
+        return numpy.frombuffer(self.values, dtype=numpy.float64).reshape(-1, len(SERIES_FIELDS))
+
+    def write(self, path):
+        # CSV, or a .npy array when path ends with .npy
+        if path.endswith('.npy'):
+            numpy.save(path, self.array())
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SERIES_FIELDS)
+            writer.writeheader()
+            for row in self.rows():
+                row['start'] = int(row['start'])
+                row['requests'] = int(row['requests'])
+                writer.writerow(row)
+
+
+def count_event(hook, events, index):
+    def counted(slot):
+        events[index] += 1
+        if hook:
+            hook(slot)
+    return counted
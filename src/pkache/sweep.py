@@ -0,0 +1,112 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import time
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+from pkache.frequency import EXACT
+from pkache.hashing import add_bucket_hash_argument, add_second_hash_argument
+from pkache.policies import POLICIES
+from pkache.simulator import HYPERBOLIC, SINGLE, TWO_TIER, make_simulator
+from pkache.traces import read_keys
+
+FIELDS = ('model', 'trace', 'd', 'front_size', 'main_size', 'front_policy', 'main_policy', 'frequencies',
+          'bucket_hash', 'second_hash', 'hit_front', 'hit_main', 'hit_miss', 'hit_ratio', 'seconds')
+
+
+def share_trace(path):
+    # Decodes the trace once into shared memory, workers map it instead of re-reading it
+    keys = array('Q', read_keys(path))
+    shm = SharedMemory(create=True, size=max(len(keys) * keys.itemsize, 1))
+    shm.buf[:len(keys) * keys.itemsize] = memoryview(keys).cast('B')
+    return shm, len(keys)
+
+
+def run_cell(cell):
+    shm_name, length, config = cell
+    shm = SharedMemory(name=shm_name)
+    keys = shm.buf[:length * 8].cast('Q')
+    try:
+        start = time.perf_counter()
+        simulator = make_simulator(config['model'], config['d'], config['front_size'], config['main_size'],
+                                   config['front_policy'], config['main_policy'], config['frequencies'],
+                                   config['bucket_hash'], config['second_hash'])
+        hit_front, hit_main, hit_miss = simulator.run(keys)
+        seconds = time.perf_counter() - start
+    finally:
+        keys.release()
+        shm.close()
+    return dict(config, hit_front=hit_front, hit_main=hit_main, hit_miss=hit_miss,
+                hit_ratio=(hit_front + hit_main) / max(hit_front + hit_main + hit_miss, 1), seconds=seconds)
+
+
+def grid(models, traces, ds, front_sizes, main_sizes, front_policies, main_policies, frequencies=(EXACT,),
+         bucket_hashes=(None,), second_hashes=(None,)):
+    seen = set()
+    for model, trace, d, front_size, main_size, front_policy, main_policy, estimator, bucket_hash, second_hash in \
+            itertools.product(models, traces, ds, front_sizes, main_sizes, front_policies, main_policies,
+                              frequencies, bucket_hashes, second_hashes):
+        # Single-tier models have no main cache, and the hyperbolic one no policy choice either
+        if model != TWO_TIER:
+            main_size = main_policy = estimator = None
+        if model == HYPERBOLIC:
+            front_policy = None
+        config = (model, trace, d, front_size, main_size, front_policy, main_policy, estimator, bucket_hash,
+                  second_hash)
+        if config not in seen:
+            seen.add(config)
+            yield dict(zip(FIELDS, config))
+
+
+def sweep(configs, processes=None):
+    configs = list(configs)
+    shared = dict()
+    try:
+        for config in configs:
+            if config['trace'] not in shared:
+                shared[config['trace']] = share_trace(config['trace'])
+        cells = [(shared[config['trace']][0].name, shared[config['trace']][1], config) for config in configs]
+        with multiprocessing.Pool(processes) as pool:
+            return pool.map(run_cell, cells, chunksize=1)
+    finally:
+        for shm, length in shared.values():
+            shm.close()
+            shm.unlink()
+
+
+def write_results(results, path, fields=FIELDS):
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.json'):
+            json.dump(results, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run every cell of a cache geometry and policy grid in parallel')
+    parser.add_argument('traces', nargs='+')
+    parser.add_argument('--model', nargs='+', choices=(SINGLE, TWO_TIER, HYPERBOLIC), default=[TWO_TIER])
+    parser.add_argument('-d', nargs='+', type=int, default=[16], help='Number of buckets')
+    parser.add_argument('--front-size', nargs='+', type=int, default=[4])
+    parser.add_argument('--main-size', nargs='+', type=int, default=[16])
+    parser.add_argument('--front-policy', nargs='+', choices=sorted(POLICIES), default=[None])
+    parser.add_argument('--main-policy', nargs='+', choices=sorted(POLICIES), default=[None])
+    parser.add_argument('--frequencies', nargs='+', default=[EXACT],
+                        help='Admission counters: exact, cm:<width>:<depth> or cmcu:<width>:<depth>, '
+                             'optionally aged with /age:<period>:<slice>[:<slots>], exact counters age every '
+                             'key whose key %% slots is in the slice and sketches have their width as slots')
+    add_bucket_hash_argument(parser, multiple=True)
+    add_second_hash_argument(parser, multiple=True)
+    parser.add_argument('-j', '--processes', type=int, default=None)
+    parser.add_argument('-o', '--output', default='sweep.csv', help='Results table, JSON if it ends with .json')
+    args = parser.parse_args()
+
+    results = sweep(grid(args.model, args.traces, args.d, args.front_size, args.main_size,
+                         args.front_policy, args.main_policy, args.frequencies, args.bucket_hash, args.second_hash),
+                    args.processes)
+    write_results(results, args.output)
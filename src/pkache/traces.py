@@ -0,0 +1,116 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LINE = 'txt'  # one key per line, e.g. query0.99.txt
+OLTP = 'lis'  # space separated, key in the first field, e.g. OLTP.lis
+WEBSEARCH = 'spc'  # comma separated, key in the second field, e.g. WebSearch1.spc
+PACKED = 'pkt'  # little-endian packed keys behind PACKED_HEADER, see pack_trace()
+
+PARSERS = {
+    LINE: int,
+    OLTP: lambda line: int(line.split(b' ')[0]),
+    WEBSEARCH: lambda line: int(line.split(b',')[1]),
+}
+
+CHUNK_SIZE = 1 << 20
+
+# magic, key width in bytes, number of keys
+PACKED_HEADER = struct.Struct('<4sIQ')
+PACKED_MAGIC = b'PKTR'
+KEY_TYPECODES = {4: 'I', 8: 'Q'}
+
+
+def trace_format(path):
+    extension = os.path.splitext(path)[1][1:]
+    return extension if extension in PARSERS or extension == PACKED else LINE
+
+
+def read_chunks(path, fmt=None, chunk_size=CHUNK_SIZE):
+    # Yields lists of keys, reading roughly chunk_size bytes of the trace at a time
+    parse = PARSERS[fmt or trace_format(path)]
+    with open(path, 'rb') as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            yield list(map(parse, lines))
+
+
+def read_keys(path, fmt=None, chunk_size=CHUNK_SIZE):
+    if (fmt or trace_format(path)) == PACKED:
+        keys = load_packed(path)
+        step = chunk_size // keys.itemsize
+        for i in range(0, len(keys), step):
+            yield from keys[i:i + step].tolist()
+        return
+    for chunk in read_chunks(path, fmt, chunk_size):
+        yield from chunk
+
+
+class PackedWriter:
+    def __init__(self, f, key_width=4):
+        self.f = f
+        self.key_width = key_width
+        self.typecode = KEY_TYPECODES[key_width]
+        self.count = 0
+        self.start = f.tell()
+        f.write(PACKED_HEADER.pack(PACKED_MAGIC, key_width, 0))
+
+    def write(self, keys):
+        keys = array(self.typecode, keys)
+        if sys.byteorder == 'big':
+            keys.byteswap()
+        keys.tofile(self.f)
+        self.count += len(keys)
+
+    def close(self):
+        # The key count is only known at the end, patch it into the header
+        end = self.f.tell()
+        self.f.seek(self.start)
+        self.f.write(PACKED_HEADER.pack(PACKED_MAGIC, self.key_width, self.count))
+        self.f.seek(end)
+
+
+def pack_trace(src, dst, fmt=None, key_width=4):
+    with open(dst, 'wb') as f:
+        writer = PackedWriter(f, key_width)
+        for chunk in read_chunks(src, fmt):
+            writer.write(chunk)
+        writer.close()
+    return writer.count
+
+
+def load_packed(path):
+    # Maps the file read-only and returns the keys without copying them
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, key_width, count = PACKED_HEADER.unpack_from(mapped)
+    if magic != PACKED_MAGIC:
+        raise ValueError('%s is not a packed trace' % path)
+    typecode = KEY_TYPECODES[key_width]
+    if numpy is not None:
+        return numpy.frombuffer(mapped, dtype='<u%d' % key_width, count=count, offset=PACKED_HEADER.size)
+    if sys.byteorder == 'big':
+        keys = array(typecode, mapped[PACKED_HEADER.size:PACKED_HEADER.size + count * key_width])
+        keys.byteswap()
+        return keys
+    return memoryview(mapped)[PACKED_HEADER.size:PACKED_HEADER.size + count * key_width].cast(typecode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a trace to the packed binary format')
+    parser.add_argument('src', help='Trace to convert')
+    parser.add_argument('dst', help='Output .pkt file')
+    parser.add_argument('--format', choices=sorted(PARSERS), default=None, help='Source format, by extension if omitted')
+    parser.add_argument('--key-width', type=int, choices=sorted(KEY_TYPECODES), default=4, help='Bytes per key')
+    args = parser.parse_args()
+    print(pack_trace(args.src, args.dst, args.format, args.key_width))